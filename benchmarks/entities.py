@@ -0,0 +1,65 @@
+"""Models of the entity sets served by benchmarks/server.py."""
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
+from pydantic import Field
+
+from OData1C.models import OdataModel
+from OData1C.odata import OData
+
+from server import CATALOG, DOCUMENT
+
+
+class MeasureUnitModel(OdataModel):
+    uid: UUID = Field(alias='Ref_Key')
+    name: str = Field(alias='Description', max_length=15)
+
+
+class NomenclatureModel(OdataModel):
+    uid: UUID = Field(alias='Ref_Key', exclude=True)
+    data_version: str = Field(alias='DataVersion', exclude=True)
+    code: str = Field(alias='Code', max_length=12)
+    name: str = Field(alias='Description', max_length=200)
+    article: str = Field(alias='Артикул', max_length=25)
+    weight: float = Field(alias='Вес')
+    deletion_mark: bool = Field(alias='ПометкаУдаления')
+    measure_unit: MeasureUnitModel = Field(alias='ЕдиницаИзмерения')
+
+    nested_models = {
+        'measure_unit': MeasureUnitModel,
+    }
+
+
+class OrderLineModel(OdataModel):
+    line_number: int = Field(alias='LineNumber')
+    nomenclature_uid: UUID = Field(alias='Номенклатура_Key')
+    quantity: Decimal = Field(alias='Количество')
+    price: Decimal = Field(alias='Цена')
+    amount: Decimal = Field(alias='Сумма')
+
+
+class OrderModel(OdataModel):
+    uid: UUID = Field(alias='Ref_Key', exclude=True)
+    data_version: str = Field(alias='DataVersion', exclude=True)
+    number: str = Field(alias='Number', max_length=11)
+    date: datetime = Field(alias='Date')
+    posted: bool = Field(alias='Posted')
+    amount: Decimal = Field(alias='СуммаДокумента')
+    goods: list[OrderLineModel] = Field(alias='Товары')
+
+    nested_models = {
+        'goods': OrderLineModel,
+    }
+
+
+class NomenclatureOdata(OData):
+    database = 'bench'
+    entity_model = NomenclatureModel
+    entity_name = CATALOG
+
+
+class OrderOdata(OData):
+    database = 'bench'
+    entity_model = OrderModel
+    entity_name = DOCUMENT
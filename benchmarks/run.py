@@ -0,0 +1,294 @@
+"""
+Benchmarks of OData1C against the local mock 1C OData server.
+
+Measures throughput, latency percentiles, peak traced memory and
+per-phase wall and CPU time of the main operations. Results are saved
+to benchmarks/results/<version>-<timestamp>.json and compared with the
+previous result of the same parameters, so that regressions are
+visible across versions.
+
+Usage (the package must be importable, e.g. pip install -e .):
+    python benchmarks/run.py
+    python benchmarks/run.py --rows 50000 --latency 0.01 --only catalog_all
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Callable
+
+from requests.auth import HTTPBasicAuth
+
+from OData1C.http import Connection
+from OData1C.instrumentation import MetricsCollector
+from OData1C.odata import Q
+
+from entities import NomenclatureOdata, OrderOdata
+from server import spawn
+
+results_dir = Path(__file__).parent / 'results'
+
+
+@dataclass
+class Context:
+    conn: Connection
+    rows: int
+    catalog_guids: list[str]
+    catalog_page: Any
+    document_page: Any
+
+
+@dataclass
+class Scenario:
+    """
+    func runs one operation and returns the number of processed
+    entities. Each run measures repeat * scale operations.
+    """
+    name: str
+    func: Callable[[Context], int]
+    scale: int = 1
+
+
+scenarios: dict[str, Scenario] = {}
+
+
+def scenario(name: str, scale: int = 1) -> Callable:
+    def register(func: Callable[[Context], int]) -> Callable:
+        scenarios[name] = Scenario(name, func, scale)
+        return func
+    return register
+
+
+@scenario('catalog_all')
+def catalog_all(ctx: Context) -> int:
+    return len(NomenclatureOdata.manager(ctx.conn).all())
+
+
+@scenario('catalog_iterator')
+def catalog_iterator(ctx: Context) -> int:
+    manager = NomenclatureOdata.manager(ctx.conn)
+    return sum(1 for _ in manager.iterator(page_size=1000))
+
+
+@scenario('catalog_stream')
+def catalog_stream(ctx: Context) -> int:
+    return len(NomenclatureOdata.manager(ctx.conn).all(stream=True))
+
+
+@scenario('catalog_trusted')
+def catalog_trusted(ctx: Context) -> int:
+    return len(NomenclatureOdata.manager(ctx.conn).all(trusted=True))
+
+
+@scenario('document_all')
+def document_all(ctx: Context) -> int:
+    return len(OrderOdata.manager(ctx.conn).all())
+
+
+@scenario('document_processes')
+def document_processes(ctx: Context) -> int:
+    manager = OrderOdata.manager(ctx.conn)
+    return len(manager.fetch_pages(workers=4, processes=4))
+
+
+@scenario('get', scale=50)
+def get(ctx: Context) -> int:
+    NomenclatureOdata.manager(ctx.conn).get(random.choice(ctx.catalog_guids))
+    return 1
+
+
+@scenario('update', scale=50)
+def update(ctx: Context) -> int:
+    NomenclatureOdata.manager(ctx.conn).update(
+        random.choice(ctx.catalog_guids),
+        {'Вес': round(random.uniform(0, 100), 3)})
+    return 1
+
+
+@scenario('get_many')
+def get_many(ctx: Context) -> int:
+    guids = ctx.catalog_guids[:1000]
+    return len(NomenclatureOdata.manager(ctx.conn).get_many(guids))
+
+
+@scenario('filter_build')
+def filter_build(ctx: Context) -> int:
+    codes = [f'00-{i:08}' for i in range(5000)]
+    manager = NomenclatureOdata.manager(ctx.conn)
+    for i in range(100):
+        manager = manager.filter(Q(name=f'n{i}') | Q(weight__gt=i))
+    manager.filter(code__in=codes).qp_filter
+    return len(codes) + 200
+
+
+@scenario('validate_catalog')
+def validate_catalog(ctx: Context) -> int:
+    manager = NomenclatureOdata.manager(ctx.conn)
+    return len(manager._validate_page(ctx.catalog_page)[0])
+
+
+@scenario('validate_document')
+def validate_document(ctx: Context) -> int:
+    manager = OrderOdata.manager(ctx.conn)
+    return len(manager._validate_page(ctx.document_page)[0])
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, round(q / 100 * (len(values) - 1)))]
+
+
+def measure(item: Scenario, ctx: Context, repeat: int) -> dict[str, Any]:
+    metrics = MetricsCollector()
+    ctx.conn.instrumentation.instruments = [metrics]
+    item.func(ctx)  # warm up caches and connections
+    metrics.reset()
+    durations = []
+    rows = 0
+    cpu_start = time.process_time()
+    for _ in range(repeat * item.scale):
+        start = time.perf_counter()
+        rows += item.func(ctx)
+        durations.append(time.perf_counter() - start)
+    cpu = time.process_time() - cpu_start
+    ctx.conn.instrumentation.instruments = []
+    total = sum(durations)
+    phases: dict[str, dict[str, float]] = {}
+    for (_, _, phase), summary in metrics.summary().items():
+        stats = phases.setdefault(phase, {'count': 0, 'wall': 0.0,
+                                          'cpu': 0.0, 'bytes': 0})
+        stats['count'] += summary['count']
+        stats['wall'] += summary['sum']
+        stats['cpu'] += summary['cpu']
+        stats['bytes'] += summary['bytes']
+    tracemalloc.start()
+    item.func(ctx)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'operations': len(durations),
+        'rows': rows,
+        'total': total,
+        'rows_per_sec': rows / total if total else 0.0,
+        'mean': statistics.fmean(durations),
+        'p50': percentile(durations, 50),
+        'p95': percentile(durations, 95),
+        'p99': percentile(durations, 99),
+        'cpu': cpu,
+        'peak_memory': peak,
+        'phases': phases,
+    }
+
+
+def environment(args: argparse.Namespace) -> dict[str, Any]:
+    try:
+        version = metadata.version('OData1C')
+    except metadata.PackageNotFoundError:
+        version = 'unknown'
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True,
+                                cwd=Path(__file__).parent).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'version': version,
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.now().isoformat('T', 'seconds'),
+        'params': {'rows': args.rows, 'lines': args.lines,
+                   'latency': args.latency, 'repeat': args.repeat},
+    }
+
+
+def previous_result(params: dict[str, Any]) -> dict[str, Any] | None:
+    for path in sorted(results_dir.glob('*.json'), reverse=True):
+        result = json.loads(path.read_text(encoding='utf-8'))
+        if result['params'] == params:
+            return result
+    return None
+
+
+def report(result: dict[str, Any], previous: dict[str, Any] | None) -> None:
+    print(f"OData1C {result['version']} ({result['commit']}), "
+          f"Python {result['python']}, {result['params']}")
+    if previous is not None:
+        print(f"Compared with {previous['version']} "
+              f"({previous['commit']}, {previous['timestamp']})")
+    print(f"{'scenario':<18}{'rows/s':>12}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'cpu s':>8}{'peak MB':>9}  change")
+    for name, stats in result['scenarios'].items():
+        change = ''
+        old = previous and previous['scenarios'].get(name)
+        if old and old['p50']:
+            ratio = stats['p50'] / old['p50'] - 1
+            change = f'{ratio:+.0%}' + (' REGRESSION' if ratio > 0.1 else '')
+        print(f"{name:<18}{stats['rows_per_sec']:>12,.0f}"
+              f"{stats['p50'] * 1000:>10.2f}{stats['p95'] * 1000:>10.2f}"
+              f"{stats['p99'] * 1000:>10.2f}{stats['cpu']:>8.2f}"
+              f"{stats['peak_memory'] / 2 ** 20:>9.1f}  {change}")
+        phases = ', '.join(f"{phase} {p['wall'] * 1000:.0f}/"
+                           f"{p['cpu'] * 1000:.0f}"
+                           for phase, p in stats['phases'].items())
+        if phases:
+            print(f"{'':<18}phases wall/cpu ms: {phases}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=10000,
+                        help='entities in each entity set')
+    parser.add_argument('--lines', type=int, default=5,
+                        help='tabular section lines of each document')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='server delay before each response, s')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs of each scenario')
+    parser.add_argument('--only', nargs='+', choices=list(scenarios),
+                        help='scenarios to run')
+    parser.add_argument('--no-save', action='store_true',
+                        help="don't save the result")
+    args = parser.parse_args()
+
+    process, host = spawn(args.rows, args.lines, args.latency)
+    try:
+        with Connection(host, 'http', HTTPBasicAuth('user', 'pass')) as conn:
+            catalog = NomenclatureOdata.manager(conn)
+            ctx = Context(
+                conn=conn,
+                rows=args.rows,
+                catalog_guids=[str(obj.uid) for obj in catalog.all()],
+                catalog_page=catalog._fetch_page(1000, 0),
+                document_page=OrderOdata.manager(conn)._fetch_page(1000, 0),
+            )
+            result = environment(args)
+            result['scenarios'] = {}
+            for name in args.only or scenarios:
+                print(f'Running {name}...', file=sys.stderr)
+                result['scenarios'][name] = measure(scenarios[name],
+                                                    ctx,
+                                                    args.repeat)
+    finally:
+        process.terminate()
+
+    report(result, previous_result(result['params']))
+    if not args.no_save:
+        results_dir.mkdir(exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = results_dir / f"{result['version']}-{stamp}.json"
+        path.write_text(json.dumps(result, indent=2), encoding='utf-8')
+        print(f'Saved {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+"""
+Local stand-in of the 1C OData REST service for benchmarks.
+
+Serves synthetic entity sets of any database:
+Catalog_Номенклатура - catalog items with a nested unit,
+Document_ЗаказКлиента - documents with the Товары tabular section.
+
+Supports $top, $skip, $count, canonical entity URLs (guid'...'),
+PATCH and $filter made of Ref_Key and Code equalities joined by 'or'.
+$select and $expand are ignored: entities always have all attributes.
+
+Run standalone: python benchmarks/server.py --rows 100000 --latency 0.02
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+CATALOG = 'Catalog_Номенклатура'
+DOCUMENT = 'Document_ЗаказКлиента'
+
+path_pattern = re.compile(
+    r"^/[^/]+/odata/standard\.odata/(?P<entity>[^/(]+)"
+    r"(?:\(guid'(?P<guid>[^']+)'\))?(?P<count>/\$count)?$")
+guid_pattern = re.compile(r"Ref_Key eq guid'([^']+)'")
+code_pattern = re.compile(r"Code eq '([^']*)'")
+
+
+def generate(rows: int, lines: int, seed: int = 0) -> dict[str, list[dict]]:
+    """
+    Generates the entity sets.
+    :param rows: Number of entities in each entity set.
+    :param lines: Number of tabular section lines of each document.
+    """
+    rnd = random.Random(seed)
+
+    def guid() -> str:
+        return str(uuid.UUID(int=rnd.getrandbits(128), version=4))
+
+    units = [{'Ref_Key': guid(), 'Description': name}
+             for name in ('шт', 'кг', 'м', 'л', 'упак')]
+    catalog = []
+    for i in range(rows):
+        catalog.append({
+            'Ref_Key': guid(),
+            'DataVersion': f'AAAAAg{i:06}=',
+            'Code': f'00-{i:08}',
+            'Description': f'Номенклатура {i} ' + 'x' * rnd.randint(0, 60),
+            'Артикул': f'A{rnd.randint(0, 10 ** 6):07}',
+            'Вес': round(rnd.uniform(0, 100), 3),
+            'ПометкаУдаления': rnd.random() < 0.05,
+            'ЕдиницаИзмерения': rnd.choice(units),
+        })
+    start = datetime(2024, 1, 1)
+    documents = []
+    for i in range(rows):
+        goods = []
+        for n in range(1, lines + 1):
+            item = rnd.choice(catalog)
+            quantity = rnd.randint(1, 100)
+            price = round(rnd.uniform(1, 1000), 2)
+            goods.append({
+                'LineNumber': str(n),
+                'Номенклатура_Key': item['Ref_Key'],
+                'Количество': quantity,
+                'Цена': price,
+                'Сумма': round(quantity * price, 2),
+            })
+        documents.append({
+            'Ref_Key': guid(),
+            'DataVersion': f'AAAAAw{i:06}=',
+            'Number': f'ЗК-{i:08}',
+            'Date': (start + timedelta(minutes=i)).isoformat('T', 'seconds'),
+            'Posted': rnd.random() < 0.9,
+            'СуммаДокумента': round(sum(g['Сумма'] for g in goods), 2),
+            'Товары': goods,
+        })
+    return {CATALOG: catalog, DOCUMENT: documents}
+
+
+class EntitySet:
+    """Entities with their JSON pre-encoded to serve pages fast."""
+
+    def __init__(self, entities: list[dict]) -> None:
+        self.entities = entities
+        self.encoded = [self.encode(e) for e in entities]
+        self.index = {e['Ref_Key']: i for i, e in enumerate(entities)}
+        self.codes = {e.get('Code'): i for i, e in enumerate(entities)}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def encode(entity: dict) -> bytes:
+        return json.dumps(entity, ensure_ascii=False).encode('utf-8')
+
+    def find(self, filter_expression: str) -> list[int] | None:
+        """Returns positions of entities matching the filter."""
+        guids = guid_pattern.findall(filter_expression)
+        codes = code_pattern.findall(filter_expression)
+        if not guids and not codes:
+            return None
+        positions = {self.index[g] for g in guids if g in self.index}
+        positions.update(self.codes[c] for c in codes if c in self.codes)
+        return sorted(positions)
+
+
+class ODataHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server: 'ODataHTTPServer'
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _respond(self, status: int, body: bytes = b'') -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self) -> tuple[EntitySet, str | None, bool, dict] | None:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        parts = urlsplit(self.path)
+        match = path_pattern.match(unquote(parts.path))
+        entity_set = match and self.server.data.get(match['entity'])
+        if entity_set is None:
+            self._respond(404, b'{"odata.error": "Not found"}')
+            return None
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        return entity_set, match['guid'], bool(match['count']), query
+
+    def do_GET(self) -> None:
+        route = self._route()
+        if route is None:
+            return
+        entity_set, guid, count, query = route
+        if guid is not None:
+            position = entity_set.index.get(guid)
+            if position is None:
+                self._respond(404, b'{"odata.error": "Not found"}')
+            else:
+                self._respond(200, entity_set.encoded[position])
+            return
+        positions = entity_set.find(query.get('$filter', ''))
+        if count:
+            total = (len(entity_set.encoded) if positions is None
+                     else len(positions))
+            self._respond(200, str(total).encode())
+            return
+        skip = int(query.get('$skip', 0))
+        top = query.get('$top')
+        stop = None if top is None else skip + int(top)
+        if positions is None:
+            page = entity_set.encoded[skip:stop]
+        else:
+            page = [entity_set.encoded[p] for p in positions[skip:stop]]
+        self._respond(200, b'{"value":[' + b','.join(page) + b']}')
+
+    def do_PATCH(self) -> None:
+        route = self._route()
+        if route is None:
+            return
+        entity_set, guid, _, _ = route
+        length = int(self.headers.get('Content-Length', 0))
+        data = json.loads(self.rfile.read(length) or b'{}')
+        position = entity_set.index.get(guid)
+        if position is None:
+            self._respond(404, b'{"odata.error": "Not found"}')
+            return
+        with entity_set.lock:
+            entity = {**entity_set.entities[position], **data}
+            entity_set.entities[position] = entity
+            entity_set.encoded[position] = entity_set.encode(entity)
+        self._respond(200, entity_set.encoded[position])
+
+
+class ODataHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self,
+                 address: tuple[str, int],
+                 data: dict[str, EntitySet],
+                 latency: float) -> None:
+        super().__init__(address, ODataHandler)
+        self.data = data
+        self.latency = latency
+
+
+class MockServer:
+    """
+    Mock 1C OData server running in a background thread.
+    Example:
+        with MockServer(rows=10000, latency=0.01) as server:
+            conn = Connection(server.host, 'http', auth)
+    :param rows: Number of entities in each entity set.
+    :param lines: Number of tabular section lines of each document.
+    :param latency: Delay before each response in seconds.
+    """
+
+    def __init__(self,
+                 rows: int = 10000,
+                 lines: int = 5,
+                 latency: float = 0.0,
+                 address: tuple[str, int] = ('127.0.0.1', 0)) -> None:
+        data = {name: EntitySet(entities)
+                for name, entities in generate(rows, lines).items()}
+        self.httpd = ODataHTTPServer(address, data, latency)
+        self._thread = None
+
+    @property
+    def host(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'{host}:{port}'
+
+    def entities(self, entity_name: str) -> list[dict]:
+        return self.httpd.data[entity_name].entities
+
+    def start(self) -> 'MockServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'MockServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+
+def _serve(pipe, rows: int, lines: int, latency: float) -> None:
+    server = MockServer(rows, lines, latency)
+    pipe.send(server.host)
+    server.httpd.serve_forever()
+
+
+def spawn(rows: int = 10000,
+          lines: int = 5,
+          latency: float = 0.0) -> tuple[multiprocessing.Process, str]:
+    """
+    Starts the server in a child process, so that it doesn't compete
+    with the measured client for the GIL and its allocations are not
+    traced. The caller must terminate the process.
+    :return: The process and the host:port of the server.
+    """
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve,
+                                      args=(child, rows, lines, latency),
+                                      daemon=True)
+    process.start()
+    return process, parent.recv()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--lines', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+    server = MockServer(args.rows, args.lines, args.latency,
+                        ('127.0.0.1', args.port))
+    print(f'Serving http://{server.host}/<database>/odata/standard.odata/')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
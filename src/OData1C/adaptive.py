@@ -0,0 +1,226 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+# Statuses of an overloaded server.
+overload_statuses = frozenset({429, 502, 503, 504})
+
+Key = tuple[str | None, str | None]
+
+
+@dataclass
+class Decision:
+    """
+    Change of the limits of a key.
+    key - (database, entity set name),
+    reason - overload, latency or success,
+    limit, page_size - new limits,
+    latency - duration of the request caused the change in seconds.
+    """
+    time: float
+    key: Key
+    reason: str
+    limit: int
+    page_size: int
+    latency: float
+
+
+@dataclass
+class KeyState:
+    """Current limits and statistics of a key."""
+    limit: float
+    page_size: int
+    in_flight: int = 0
+    latency: float | None = None
+    requests: int = 0
+    errors: int = 0
+    overloads: int = 0
+    last_decrease: float = 0.0
+
+
+class AdaptiveController:
+    """
+    AIMD controller of the number of concurrent requests and of the
+    page size ($top) per database and entity set. Successful requests
+    faster than target_latency increase the limits additively: the
+    concurrency limit by one per limit requests, the page size by
+    page_size_step. Overload (statuses 429, 502, 503, 504, timeouts
+    and connection errors) and requests slower than target_latency
+    decrease the limits multiplicatively by backoff, at most once per
+    the average latency, so that one burst of failures is one
+    decrease. Pass the controller to http.Connection, the managers
+    take the page size from it when page_size isn't set.
+    :param initial_limit: Initial number of concurrent requests.
+    :param min_limit: Minimum number of concurrent requests.
+    :param max_limit: Maximum number of concurrent requests.
+    :param initial_page_size: Initial page size.
+    :param min_page_size: Minimum page size.
+    :param max_page_size: Maximum page size.
+    :param page_size_step: Page size increase.
+    :param target_latency: Acceptable duration of a request in seconds.
+    :param backoff: Multiplier of the limits on overload.
+    :param history: Number of the last decisions kept.
+    """
+
+    def __init__(self,
+                 initial_limit: int = 4,
+                 min_limit: int = 1,
+                 max_limit: int = 32,
+                 initial_page_size: int = 1000,
+                 min_page_size: int = 100,
+                 max_page_size: int = 10000,
+                 page_size_step: int = 100,
+                 target_latency: float = 5.0,
+                 backoff: float = 0.5,
+                 history: int = 1000) -> None:
+        if not min_limit <= initial_limit <= max_limit:
+            raise ValueError('initial_limit must be in min_limit..max_limit.')
+        if not min_page_size <= initial_page_size <= max_page_size:
+            raise ValueError(
+                'initial_page_size must be in min_page_size..max_page_size.')
+        self.initial_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.initial_page_size = initial_page_size
+        self.min_page_size = min_page_size
+        self.max_page_size = max_page_size
+        self.page_size_step = page_size_step
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.decisions: deque[Decision] = deque(maxlen=history)
+        self._states: dict[Key, KeyState] = {}
+        self._condition = threading.Condition()
+
+    def _state(self, key: Key) -> KeyState:
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = KeyState(self.initial_limit,
+                                                 self.initial_page_size)
+        return state
+
+    def limit(self, key: Key) -> int:
+        """Current number of concurrent requests of the key."""
+        with self._condition:
+            return int(self._state(key).limit)
+
+    def page_size(self, key: Key) -> int:
+        """Current page size of the key."""
+        with self._condition:
+            return self._state(key).page_size
+
+    def limits(self) -> dict[Key, dict[str, Any]]:
+        """Returns the current limits and statistics of all keys."""
+        with self._condition:
+            return {key: {'limit': int(state.limit),
+                          'page_size': state.page_size,
+                          'in_flight': state.in_flight,
+                          'latency': state.latency,
+                          'requests': state.requests,
+                          'errors': state.errors,
+                          'overloads': state.overloads}
+                    for key, state in self._states.items()}
+
+    def acquire(self, key: Key) -> None:
+        """Blocks until the number of requests in flight is below the limit."""
+        with self._condition:
+            state = self._state(key)
+            while state.in_flight >= int(state.limit):
+                self._condition.wait()
+            state.in_flight += 1
+
+    def release(self,
+                key: Key,
+                duration: float,
+                status: int | None = None,
+                error: BaseException | None = None) -> None:
+        """
+        Releases the request slot and adjusts the limits of the key.
+        :param duration: Duration of the request in seconds.
+        :param status: Response status or None if the request failed.
+        :param error: Exception raised by the request.
+        """
+        with self._condition:
+            state = self._state(key)
+            state.in_flight -= 1
+            state.requests += 1
+            if state.latency is None:
+                state.latency = duration
+            else:
+                state.latency += 0.2 * (duration - state.latency)
+            overload = status in overload_statuses or (
+                error is not None and status is None)
+            if overload:
+                state.overloads += 1
+            if error is not None or (status is not None and status >= 500):
+                state.errors += 1
+            if overload:
+                self._decrease(key, state, 'overload', duration)
+            elif duration > self.target_latency:
+                self._decrease(key, state, 'latency', duration)
+            elif error is None and (status is None or status < 400):
+                self._increase(key, state, duration)
+            self._condition.notify_all()
+
+    def _decrease(self,
+                  key: Key,
+                  state: KeyState,
+                  reason: str,
+                  duration: float) -> None:
+        now = time.monotonic()
+        if now - state.last_decrease < state.latency:
+            return
+        state.last_decrease = now
+        state.limit = max(self.min_limit, state.limit * self.backoff)
+        state.page_size = max(self.min_page_size,
+                              int(state.page_size * self.backoff))
+        self._record(key, state, reason, duration)
+
+    def _increase(self, key: Key, state: KeyState, duration: float) -> None:
+        limit, page_size = int(state.limit), state.page_size
+        state.limit = min(self.max_limit, state.limit + 1 / state.limit)
+        if duration < self.target_latency / 2:
+            state.page_size = min(self.max_page_size,
+                                  state.page_size + self.page_size_step)
+        if int(state.limit) != limit or state.page_size != page_size:
+            self._record(key, state, 'success', duration)
+
+    def _record(self,
+                key: Key,
+                state: KeyState,
+                reason: str,
+                duration: float) -> None:
+        self.decisions.append(Decision(time=time.time(),
+                                       key=key,
+                                       reason=reason,
+                                       limit=int(state.limit),
+                                       page_size=state.page_size,
+                                       latency=duration))
+
+
+class Slot:
+    """
+    Context manager holding a request slot of the controller while
+    the request is sent. Set status to the response status. Does
+    nothing if the controller is None.
+    """
+
+    def __init__(self, controller: AdaptiveController | None, key: Key):
+        self.controller = controller
+        self.key = key
+        self.status: int | None = None
+        self._start = 0.0
+
+    def __enter__(self) -> 'Slot':
+        if self.controller is not None:
+            self.controller.acquire(self.key)
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if self.controller is not None:
+            self.controller.release(self.key,
+                                    time.perf_counter() - self._start,
+                                    self.status,
+                                    exc_val)
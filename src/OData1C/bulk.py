@@ -0,0 +1,153 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from pydantic import ValidationError
+
+from OData1C.exeptions import ClientConnectionError, ODataError
+
+# Errors of a single item that don't abort a bulk operation.
+item_errors = (ODataError, ClientConnectionError, ValidationError)
+
+
+@dataclass
+class ItemResult:
+    """
+    Result of a bulk operation item.
+    key - GUID of the entity or index of the item,
+    result - return value of the operation (e.g. validated entity),
+    error - exception raised by the operation,
+    elapsed - duration of the operation in seconds.
+    """
+    key: Any
+    result: Any = None
+    error: Exception | None = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class BulkReport:
+    """
+    results - results of the processed items in the input order,
+    skipped - keys of the items skipped as done by the checkpoint.
+    """
+    results: list[ItemResult] = field(default_factory=list)
+    skipped: list[Any] = field(default_factory=list)
+
+    @property
+    def succeeded(self) -> list[ItemResult]:
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self) -> list[ItemResult]:
+        return [r for r in self.results if not r.ok]
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter of the number of operations per second.
+    Operations are spread evenly: acquire() blocks until the next
+    1 / rate second slot.
+    """
+
+    def __init__(self, rate: float) -> None:
+        if rate <= 0:
+            raise ValueError('rate must be positive.')
+        self.interval = 1 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Checkpoint:
+    """
+    Text file with the keys of successfully processed items, one per
+    line. A bulk operation interrupted for any reason can be restarted
+    with the same checkpoint, the done items will be skipped.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.done: set[str] = set()
+        if self.path.exists():
+            with open(self.path, encoding='utf-8') as file:
+                self.done = {line.strip() for line in file if line.strip()}
+
+    def __contains__(self, key: Any) -> bool:
+        return str(key) in self.done
+
+    def add(self, key: Any) -> None:
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(f'{key}\n')
+            self.done.add(str(key))
+
+
+def run_bulk(func: Callable[[Any], Any],
+             items: Iterable[tuple[Any, Any]],
+             workers: int = 4,
+             rate_limit: float | None = None,
+             checkpoint: Checkpoint | None = None) -> BulkReport:
+    """
+    Calls func(item) for each (key, item) pair using a pool of threads.
+    At most 2 * workers items are in flight, so items may be
+    a lazy iterable of any size. Item errors are recorded in the report
+    instead of aborting the whole run.
+    :param rate_limit: Maximum number of calls per second.
+    :param checkpoint: Items whose keys are in the checkpoint are
+    skipped, keys of successful items are added to it.
+    :return: Report with the results in the order of items.
+    """
+    if workers < 1:
+        raise ValueError('workers must be a positive integer.')
+    limiter = RateLimiter(rate_limit) if rate_limit is not None else None
+    report = BulkReport()
+
+    def call(item_result: ItemResult, item: Any) -> None:
+        if limiter is not None:
+            limiter.acquire()
+        start = time.perf_counter()
+        try:
+            item_result.result = func(item)
+        except item_errors as e:
+            item_result.error = e
+        finally:
+            item_result.elapsed = time.perf_counter() - start
+        if item_result.ok and checkpoint is not None:
+            checkpoint.add(item_result.key)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        for key, item in items:
+            if checkpoint is not None and key in checkpoint:
+                report.skipped.append(key)
+                continue
+            item_result = ItemResult(key=key)
+            report.results.append(item_result)
+            in_flight.add(executor.submit(call, item_result, item))
+            if len(in_flight) >= 2 * workers:
+                done, in_flight = wait(in_flight,
+                                       return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+        for future in in_flight:
+            future.result()
+    return report
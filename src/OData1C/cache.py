@@ -0,0 +1,165 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    reason: str
+    headers: dict[str, str]
+    content: bytes
+
+
+def _matches(key: str, prefix: str) -> bool:
+    """
+    Checks whether the key is the URL of the prefix entity set or one
+    of its entities: prefix, prefix?..., prefix(...) or prefix/...
+    """
+    return key == prefix or (key.startswith(prefix)
+                             and key[len(prefix)] in '?(/')
+
+
+class CacheBackend:
+    """
+    Base class of response cache storages. Keys are request URLs.
+    Subclass it to implement a custom storage.
+    """
+
+    def get(self, key: str) -> CachedResponse | None:
+        raise NotImplementedError
+
+    def set(self, key: str, value: CachedResponse, ttl: float) -> None:
+        raise NotImplementedError
+
+    def invalidate(self, prefix: str) -> None:
+        """
+        Deletes the responses of the entity set with the URL prefix and
+        of its entities.
+        """
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """In-memory LRU cache of at most maxsize responses with TTL."""
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, tuple[float, CachedResponse]] = (
+            OrderedDict())
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: CachedResponse, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._data if _matches(k, prefix)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class SqliteCache(CacheBackend):
+    """
+    LRU cache of at most maxsize responses with TTL stored in a sqlite
+    database file. The cache survives process restarts and can be
+    shared by several processes.
+    """
+
+    def __init__(self, path: str, maxsize: int = 10000) -> None:
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path,
+                                   check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS odata_cache ('
+            'key TEXT PRIMARY KEY, '
+            'status_code INTEGER, '
+            'reason TEXT, '
+            'headers TEXT, '
+            'content BLOB, '
+            'expires REAL, '
+            'accessed REAL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS odata_cache_accessed '
+                         'ON odata_cache (accessed)')
+
+    def get(self, key: str) -> CachedResponse | None:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                'SELECT status_code, reason, headers, content, expires '
+                'FROM odata_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[4] <= now:
+                self._db.execute('DELETE FROM odata_cache WHERE key = ?',
+                                 (key,))
+                return None
+            self._db.execute(
+                'UPDATE odata_cache SET accessed = ? WHERE key = ?',
+                (now, key))
+        status_code, reason, headers, content, _ = row
+        return CachedResponse(status_code,
+                              reason,
+                              json.loads(headers),
+                              content)
+
+    def set(self, key: str, value: CachedResponse, ttl: float) -> None:
+        now = time.time()
+        headers = json.dumps(value.headers)
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO odata_cache VALUES '
+                '(?, ?, ?, ?, ?, ?, ?)',
+                (key, value.status_code, value.reason, headers,
+                 value.content, now + ttl, now)
+            )
+            self._db.execute(
+                'DELETE FROM odata_cache WHERE key IN ('
+                'SELECT key FROM odata_cache ORDER BY accessed DESC '
+                'LIMIT -1 OFFSET ?)', (self.maxsize,)
+            )
+
+    def invalidate(self, prefix: str) -> None:
+        with self._lock:
+            self._db.execute(
+                'DELETE FROM odata_cache WHERE key = ? '
+                'OR substr(key, 1, ?) IN (?, ?, ?)',
+                (prefix, len(prefix) + 1,
+                 f'{prefix}?', f'{prefix}(', f'{prefix}/')
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute('DELETE FROM odata_cache')
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,114 @@
+import threading
+from typing import Any, Callable, Hashable, Iterable
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Thread-safe suppression of duplicate calls. While a call with a
+    key is in flight, concurrent calls with the same key don't execute
+    their function, they wait for the first call and get its result or
+    its exception.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> tuple[Any, bool]:
+        """
+        Executes func() unless a call with the key is in flight.
+        :return: The result and whether it is shared with another call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class _Batch:
+    def __init__(self) -> None:
+        self.keys: dict[Hashable, None] = {}
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results: dict[Hashable, Any] = {}
+        self.error: BaseException | None = None
+
+
+class MicroBatcher:
+    """
+    Thread-safe batching of concurrent lookups by key. The first
+    caller waits up to window seconds, or until max_size keys are
+    collected, then loads all the collected keys with one call of
+    load(keys) and hands the results out to the waiting callers.
+    :param load: Function returning {key: value} for a list of keys.
+    Missing keys are absent.
+    :param window: Time to collect keys in seconds.
+    :param max_size: Maximum number of keys in a batch.
+    """
+
+    def __init__(self,
+                 load: Callable[[list[Any]], dict[Hashable, Any]],
+                 window: float,
+                 max_size: int = 100) -> None:
+        self.load = load
+        self.window = window
+        self.max_size = max_size
+        self._batch: _Batch | None = None
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the value of the key loaded together with the keys
+        requested concurrently by other threads.
+        """
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _Batch()
+            batch.keys[key] = None
+            if len(batch.keys) >= self.max_size:
+                self._batch = None
+                batch.full.set()
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+            self._load(batch, batch.keys)
+        else:
+            batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+        return batch.results.get(key, default)
+
+    def _load(self, batch: _Batch, keys: Iterable[Hashable]) -> None:
+        try:
+            batch.results = self.load(list(keys))
+        except BaseException as e:
+            batch.error = e
+        finally:
+            batch.done.set()
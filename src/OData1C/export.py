@@ -0,0 +1,277 @@
+import csv
+import types
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Iterable, Type, Union, get_args, get_origin
+
+from OData1C.models import OdataModel
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+
+@dataclass
+class Column:
+    name: str
+    path: tuple[str, ...]
+    type: Any
+
+
+@dataclass
+class Table:
+    """
+    Columnar layout of a model. Fields listed in nested_models are
+    flattened into columns named <field>_<nested_field>. Nested model
+    lists (tabular sections) become child tables with the key of the
+    parent row and the line number (parent_line_number, which doesn't
+    collide with a line_number field of the tabular section).
+    """
+    name: str
+    model: Type[OdataModel]
+    columns: list[Column] = field(default_factory=list)
+    children: dict[str, 'Table'] = field(default_factory=dict)
+    parent_key: Column | None = None
+
+    @classmethod
+    def from_model(cls,
+                   model: Type[OdataModel],
+                   name: str,
+                   parent_key: Column | None = None) -> 'Table':
+        table = cls(name=name, model=model, parent_key=parent_key)
+        if parent_key is not None:
+            table.columns.append(parent_key)
+            table.columns.append(Column('parent_line_number', (), int))
+        table._add_columns(model, (), '')
+        return table
+
+    def _add_columns(self,
+                     model: Type[OdataModel],
+                     path: tuple[str, ...],
+                     prefix: str) -> None:
+        nested_models = model.nested_models or {}
+        for name, info in model.model_fields.items():
+            annotation = _unwrap_optional(info.annotation)
+            if name in nested_models:
+                if get_origin(annotation) is list:
+                    if path:
+                        raise ValueError(
+                            f'Tabular section {prefix}{name} of a nested '
+                            f'model is not supported.')
+                    self.children[name] = Table.from_model(
+                        nested_models[name],
+                        f'{self.name}.{name}',
+                        self.key_column())
+                else:
+                    self._add_columns(nested_models[name],
+                                      (*path, name),
+                                      f'{prefix}{name}_')
+            else:
+                self.columns.append(
+                    Column(f'{prefix}{name}', (*path, name), annotation))
+
+    def key_column(self) -> Column:
+        """Returns the parent key column for child tables."""
+        for name, info in self.model.model_fields.items():
+            if info.alias == 'Ref_Key':
+                return Column(f'parent_{name}',
+                              (name,),
+                              _unwrap_optional(info.annotation))
+        return Column('parent_row', (), int)
+
+    def tables(self) -> Iterable['Table']:
+        yield self
+        for child in self.children.values():
+            yield from child.tables()
+
+
+def _unwrap_optional(annotation: Any) -> Any:
+    if get_origin(annotation) in (Union, types.UnionType):
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _get(obj: Any, path: tuple[str, ...]) -> Any:
+    for name in path:
+        if obj is None:
+            return None
+        obj = getattr(obj, name)
+    return obj
+
+
+class CsvTableWriter:
+
+    def __init__(self, path: Path, table: Table) -> None:
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([column.name for column in table.columns])
+
+    def write(self, columns: list[list[Any]]) -> None:
+        self._writer.writerows(zip(*[[_csv_value(v) for v in values]
+                                     for values in columns]))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat('T', 'seconds')
+    return value
+
+
+def _arrow_type(annotation: Any) -> Any:
+    types_map = {
+        bool: pa.bool_(),
+        int: pa.int64(),
+        float: pa.float64(),
+        Decimal: pa.decimal128(38, 10),
+        datetime: pa.timestamp('s'),
+        date: pa.date32(),
+    }
+    return types_map.get(annotation, pa.string())
+
+
+def _arrow_value(value: Any, arrow_type: Any) -> Any:
+    """
+    Converts the JSON value of a trusted record (not validated) into
+    the Python type of the column.
+    """
+    if pa.types.is_timestamp(arrow_type) and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if pa.types.is_date(arrow_type) and isinstance(value, str):
+        return datetime.fromisoformat(value).date()
+    if pa.types.is_decimal(arrow_type) and isinstance(value,
+                                                      (int, float, str)):
+        return Decimal(str(value))
+    # 1C sends some numbers, e.g. LineNumber, as strings.
+    if pa.types.is_integer(arrow_type) and isinstance(value, str):
+        return int(value)
+    if pa.types.is_floating(arrow_type) and isinstance(value, str):
+        return float(value)
+    return value
+
+
+class ParquetTableWriter:
+
+    def __init__(self, path: Path, table: Table) -> None:
+        if pa is None:
+            raise ImportError(
+                'Parquet export requires pyarrow. '
+                'Install it with: pip install OData1C[parquet]')
+        self.schema = pa.schema([(column.name, _arrow_type(column.type))
+                                 for column in table.columns])
+        self._writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, columns: list[list[Any]]) -> None:
+        arrays = []
+        for values, schema_field in zip(columns, self.schema):
+            if pa.types.is_string(schema_field.type):
+                values = [None if v is None else str(v) for v in values]
+            elif not pa.types.is_boolean(schema_field.type):
+                values = [_arrow_value(v, schema_field.type) for v in values]
+            arrays.append(pa.array(values, type=schema_field.type))
+        self._writer.write_table(
+            pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+writers = {
+    'csv': CsvTableWriter,
+    'parquet': ParquetTableWriter,
+}
+
+
+def export(manager: Any,
+           path: str | Path,
+           file_format: str = 'parquet',
+           page_size: int = 1000,
+           ignor_invalid: bool = False,
+           trusted: bool = False) -> dict[str, Path]:
+    """
+    Streams the entity set of the manager into columnar files page by
+    page, so that at most one page of objects and column buffers is
+    held in memory. Column types are derived from the model field
+    annotations. The entity set is written to path, each tabular
+    section (list of nested models) to a child file named
+    <stem>.<field><suffix> with the parent key and line number columns.
+    The filter(), top() and skip() settings of the manager are
+    respected.
+    :param manager: ODataManager instance.
+    :param path: Output file path.
+    :param file_format: 'parquet' (requires pyarrow) or 'csv'.
+    :param page_size: Number of objects requested and written at once.
+    :param ignor_invalid: See ODataManager.all().
+    :param trusted: Skip validation and read the pages as lightweight
+    records, see ODataManager.all().
+    :return: {table name: file path}.
+    """
+    if file_format not in writers:
+        raise ValueError(f'Unknown format {file_format}. '
+                         f'Use one of {list(writers)}')
+    path = Path(path)
+    root = Table.from_model(manager.odata_class.entity_model,
+                            manager.odata_class.entity_name)
+    paths = {root.name: path}
+    for name, child in root.children.items():
+        paths[child.name] = path.with_name(f'{path.stem}.{name}{path.suffix}')
+    table_writers = {}
+    try:
+        for table in root.tables():
+            table_writers[table.name] = writers[file_format](
+                paths[table.name], table)
+        buffers = _new_buffers(root)
+        rows = 0
+        for obj in manager.iterator(page_size=page_size,
+                                    ignor_invalid=ignor_invalid,
+                                    trusted=trusted):
+            _append(root, obj, buffers, rows)
+            rows += 1
+            if rows % page_size == 0:
+                _flush(buffers, table_writers)
+                buffers = _new_buffers(root)
+        _flush(buffers, table_writers)
+    finally:
+        for writer in table_writers.values():
+            writer.close()
+    return paths
+
+
+def _new_buffers(root: Table) -> dict[str, list[list[Any]]]:
+    return {table.name: [[] for _ in table.columns]
+            for table in root.tables()}
+
+
+def _append(table: Table,
+            obj: Any,
+            buffers: dict[str, list[list[Any]]],
+            row: int) -> None:
+    for column, values in zip(table.columns, buffers[table.name]):
+        values.append(_get(obj, column.path))
+    for name, child in table.children.items():
+        key = row if child.parent_key.path == () else _get(
+            obj, child.parent_key.path)
+        child_buffers = buffers[child.name]
+        for line_number, line in enumerate(getattr(obj, name) or (), 1):
+            child_buffers[0].append(key)
+            child_buffers[1].append(line_number)
+            for column, values in zip(child.columns[2:],
+                                      child_buffers[2:]):
+                values.append(_get(line, column.path))
+
+
+def _flush(buffers: dict[str, list[list[Any]]],
+           table_writers: dict[str, Any]) -> None:
+    for name, columns in buffers.items():
+        if columns and columns[0]:
+            table_writers[name].write(columns)
@@ -1,12 +1,26 @@
-from dataclasses import dataclass
-from typing import Any
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Iterable
 from urllib.parse import quote, urlencode
 
 import requests
 import requests.auth as auth
 import requests.exceptions as r_exceptions
+from requests.adapters import HTTPAdapter
 
+from OData1C.adaptive import AdaptiveController, Slot
+from OData1C.cache import CacheBackend, CachedResponse
+from OData1C.coalesce import MicroBatcher, SingleFlight
 from OData1C.exeptions import ClientConnectionError
+from OData1C.instrumentation import Event, Instrument, Instrumentation
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
 
 @dataclass
 class Request:
@@ -14,66 +28,391 @@ class Request:
     relative_url: str
     query_params: dict[str, Any] | None = None
     data: dict[str, Any] | None = None
+    headers: dict[str, str] | None = None
+    # Entity set name, used to label instrumentation events.
+    entity: str | None = None
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Retry policy of http.Connection. A request is retried on connection
+    errors, timeouts and statuses from retry_statuses if its method is
+    in methods. The delay before the n-th retry is
+    backoff_factor * 2 ** n seconds, limited by backoff_max and
+    randomized by +-jitter share. The Retry-After header of the
+    response takes precedence. Subclass and override should_retry()
+    or get_delay() to customize the policy.
+    """
+    retries: int = 3
+    backoff_factor: float = 0.5
+    backoff_max: float = 30
+    jitter: float = 0.5
+    retry_statuses: frozenset[int] = frozenset({502, 503, 504})
+    methods: frozenset[str] = field(
+        default=frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}))
+
+    def should_retry(self,
+                     method: str,
+                     attempt: int,
+                     response: requests.Response | None = None) -> bool:
+        """
+        :param method: Request method.
+        :param attempt: Number of the failed attempt, starting from 0.
+        :param response: Response or None if the request failed.
+        """
+        if attempt >= self.retries or method.upper() not in self.methods:
+            return False
+        return response is None or response.status_code in self.retry_statuses
+
+    def get_delay(self,
+                  attempt: int,
+                  response: requests.Response | None = None) -> float:
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        delay = min(self.backoff_factor * 2 ** attempt, self.backoff_max)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
 
-class Connection:
+class BaseConnection:
 
     def __init__(self,
                  host: str,
                  protocol: str,
-                 authentication: auth.AuthBase,
+                 authentication: Any,
                  connection_timeout: int | float = 10,
-                 read_timeout: int | float = 121) -> None:
+                 read_timeout: int | float = 121,
+                 instruments: Iterable[Instrument] = ()) -> None:
         self.base_url = f'{protocol}://{host}/'
         self.connection_timeout = connection_timeout
         self.read_timeout = read_timeout
         self.auth = authentication
+        self.instrumentation = Instrumentation(instruments)
+        self.controller: AdaptiveController | None = None
         self.headers = {
             # 'Content-Type': 'application/json',
             'Accept': 'application/json',
             # 'Connection': 'keep-alive'
         }
+
+    def get_url(self,
+                relative_url: str,
+                query_params: dict[str, Any] | None = None) -> str:
+        url = f'{self.base_url}{relative_url}'
+        if query_params:
+            url = f'{url}?{urlencode(query_params, quote_via=quote)}'
+        return url
+
+
+class Connection(BaseConnection):
+    """
+    Blocking connection based on the requests library. The connection
+    owns a session with a keep-alive connection pool which is created
+    on the first request and reused by all subsequent requests,
+    including requests from different threads. The pool is released
+    by close() or on exit from the context manager.
+    pool_maxsize - maximum number of kept connections to the host,
+    retry - RetryPolicy, by default requests are not retried,
+    cache - CacheBackend storing GET responses, see send_request(),
+    instruments - receivers of timing events, see instrumentation.Event,
+    coalesce - concurrent identical GET requests are sent once, see
+    send_request(),
+    controller - AdaptiveController limiting the number of concurrent
+    requests and the page size per database and entity set.
+    """
+
+    def __init__(self,
+                 host: str,
+                 protocol: str,
+                 authentication: auth.AuthBase,
+                 connection_timeout: int | float = 10,
+                 read_timeout: int | float = 121,
+                 pool_maxsize: int = 10,
+                 retry: RetryPolicy | None = None,
+                 cache: CacheBackend | None = None,
+                 instruments: Iterable[Instrument] = (),
+                 coalesce: bool = False,
+                 controller: AdaptiveController | None = None) -> None:
+        super().__init__(host,
+                         protocol,
+                         authentication,
+                         connection_timeout,
+                         read_timeout,
+                         instruments)
+        self.pool_maxsize = pool_maxsize
+        self.retry = retry
+        self.cache = cache
+        self.coalesce = coalesce
+        self.controller = controller
+        self._single_flight = SingleFlight()
+        self._batchers: dict[Hashable, MicroBatcher] = {}
         self._session = None
+        self._lock = threading.Lock()
 
     def __enter__(self) -> 'Connection':
-        self._session = self._create_session()
+        self._get_session()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
-        self._session.close()
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def get_batcher(self,
+                    key: Hashable,
+                    create: Callable[[], MicroBatcher]) -> MicroBatcher:
+        """
+        Returns the MicroBatcher of the key shared by the users of the
+        connection, creates it with create() on the first call.
+        """
+        with self._lock:
+            batcher = self._batchers.get(key)
+            if batcher is None:
+                batcher = self._batchers[key] = create()
+            return batcher
 
     def _create_session(self) -> requests.Session:
         session = requests.Session()
         session.auth = self.auth
         session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1,
+                              pool_maxsize=self.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
         return session
 
-    def get_url(self,
-                relative_url: str,
-                query_params: dict[str, Any] | None = None) -> str:
-        url = f'{self.base_url}{relative_url}'
-        if query_params:
-            url = f'{url}?{urlencode(query_params, quote_via=quote)}'
-        return url
+    def _get_session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                self._session = self._create_session()
+            return self._session
+
+    def invalidate(self, relative_url: str) -> None:
+        """
+        Deletes cached responses of the entity set with the given URL
+        and of its entities.
+        """
+        if self.cache is not None:
+            self.cache.invalidate(self.get_url(relative_url))
 
     def send_request(self,
-                     request: Request) -> requests.Response:
-        if self._session is None:
-            session = self._create_session()
+                     request: Request,
+                     stream: bool = False,
+                     cache_ttl: int | float | None = None
+                     ) -> requests.Response:
+        """
+        Sends the request. If stream is True, the response body is not
+        downloaded in advance and can be read by chunks with
+        Response.iter_content(). The caller must close such a response.
+        Requests are retried according to the retry policy.
+        If the connection has a cache and cache_ttl is set, successful
+        responses to GET requests are cached for cache_ttl seconds
+        by the request URL.
+        If coalesce is set, a GET request (not streamed) with the same
+        URL as a request in flight is not sent: the caller waits for
+        the response of the request in flight and gets its copy.
+        """
+        measure = self.instrumentation.measure
+        attrs = {'entity': request.entity, 'method': request.method}
+        with measure('prepare', **attrs) as event:
+            url = self.get_url(request.relative_url, request.query_params)
+            event.url = url
+        attrs['url'] = url
+        use_cache = (self.cache is not None and cache_ttl
+                     and request.method == 'GET' and not stream)
+        if use_cache:
+            with measure('cache', **attrs) as event:
+                cached = self.cache.get(url)
+                if cached is not None:
+                    event.status = cached.status_code
+                    event.bytes = len(cached.content)
+            if cached is not None:
+                return self._cached_response(url, cached)
+        if self.coalesce and request.method == 'GET' and not stream:
+            response = self._send_coalesced(url, request)
         else:
-            session = self._session
-        url = self.get_url(request.relative_url, request.query_params)
+            response = self._send(url, request, stream)
+        if use_cache and response.status_code == 200:
+            self.cache.set(url,
+                           CachedResponse(response.status_code,
+                                          response.reason,
+                                          dict(response.headers),
+                                          response.content),
+                           cache_ttl)
+        return response
+
+    def _send_coalesced(self,
+                        url: str,
+                        request: Request) -> requests.Response:
+        """
+        Sends the request unless a request with the URL is in flight.
+        Callers sharing a response get its copies. Their wait is
+        timed as the 'coalesce' phase.
+        """
+        start = time.perf_counter()
+        response, shared = self._single_flight.do(
+            url, lambda: self._send(url, request, False))
+        if not shared:
+            return response
+        self.instrumentation.emit(Event('coalesce',
+                                        entity=request.entity,
+                                        method=request.method,
+                                        url=url,
+                                        duration=time.perf_counter() - start,
+                                        status=response.status_code))
+        return self._cached_response(url,
+                                     CachedResponse(response.status_code,
+                                                    response.reason,
+                                                    dict(response.headers),
+                                                    response.content))
+
+    @staticmethod
+    def _cached_response(url: str,
+                         cached: CachedResponse) -> requests.Response:
+        response = requests.Response()
+        response.url = url
+        response.status_code = cached.status_code
+        response.reason = cached.reason
+        response.headers.update(cached.headers)
+        response.encoding = requests.utils.get_encoding_from_headers(
+            response.headers)
+        response._content = cached.content
+        response._content_consumed = True
+        return response
+
+    def _send(self,
+              url: str,
+              request: Request,
+              stream: bool) -> requests.Response:
+        session = self._get_session()
         req = requests.Request(method=request.method,
                                url=url,
+                               headers=request.headers,
                                json=request.data)
         prepared = session.prepare_request(req)
+        measure = self.instrumentation.measure
+        attrs = {'entity': request.entity, 'method': request.method,
+                 'url': url}
+        # Requests are limited per database and entity set.
+        key = (request.relative_url.split('/', 1)[0], request.entity)
+        attempt = 0
+        while True:
+            try:
+                with Slot(self.controller, key) as slot:
+                    # The body is downloaded separately to time it apart
+                    # from the time to first byte and to retry its
+                    # failures.
+                    with measure('send', **attrs) as event:
+                        response: requests.Response | None = session.send(
+                            prepared,
+                            stream=True,
+                            timeout=(self.connection_timeout,
+                                     self.read_timeout)
+                        )
+                        event.status = response.status_code
+                    slot.status = response.status_code
+                    if (self.retry is None
+                            or not self.retry.should_retry(request.method,
+                                                           attempt,
+                                                           response)):
+                        if not stream:
+                            with measure('download', **attrs) as event:
+                                event.status = response.status_code
+                                event.bytes = len(response.content)
+                        return response
+                    response.close()
+            except (r_exceptions.ConnectionError,
+                    r_exceptions.Timeout,
+                    r_exceptions.ChunkedEncodingError,
+                    r_exceptions.ContentDecodingError):
+                if (self.retry is None
+                        or not self.retry.should_retry(request.method,
+                                                       attempt)):
+                    raise ClientConnectionError
+                response = None
+            time.sleep(self.retry.get_delay(attempt, response))
+            attempt += 1
+
+
+class AsyncConnection(BaseConnection):
+    """
+    Asynchronous connection based on the httpx library
+    (pip install OData1C[async]). Can be used as an asynchronous
+    context manager, then all requests share one client and its
+    connection pool. The transport argument accepts any
+    httpx.AsyncBaseTransport, e.g. httpx.MockTransport for tests.
+    Authentication may be an httpx.Auth instance, a (user, password)
+    tuple or requests.auth.HTTPBasicAuth.
+    """
+
+    def __init__(self,
+                 host: str,
+                 protocol: str,
+                 authentication: Any,
+                 connection_timeout: int | float = 10,
+                 read_timeout: int | float = 121,
+                 transport: Any = None,
+                 instruments: Iterable[Instrument] = ()) -> None:
+        if httpx is None:
+            raise ImportError(
+                'AsyncConnection requires httpx. '
+                'Install it with: pip install OData1C[async]')
+        if isinstance(authentication, auth.HTTPBasicAuth):
+            authentication = (authentication.username,
+                              authentication.password)
+        super().__init__(host,
+                         protocol,
+                         authentication,
+                         connection_timeout,
+                         read_timeout,
+                         instruments)
+        self.transport = transport
+        self._client = None
+
+    async def __aenter__(self) -> 'AsyncConnection':
+        self._client = self._create_client()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self._client.aclose()
+        self._client = None
+
+    def _create_client(self) -> 'httpx.AsyncClient':
+        return httpx.AsyncClient(
+            auth=self.auth,
+            headers=self.headers,
+            timeout=httpx.Timeout(self.read_timeout,
+                                  connect=self.connection_timeout),
+            transport=self.transport
+        )
+
+    async def send_request(self, request: Request) -> 'httpx.Response':
+        if self._client is None:
+            client = self._create_client()
+        else:
+            client = self._client
+        url = self.get_url(request.relative_url, request.query_params)
         try:
-            response: requests.Response = session.send(
-                prepared,
-                timeout=(self.connection_timeout, self.read_timeout)
-            )
-        except (r_exceptions.ConnectionError, r_exceptions.Timeout):
+            with self.instrumentation.measure('send',
+                                              entity=request.entity,
+                                              method=request.method,
+                                              url=url) as event:
+                response = await client.request(method=request.method,
+                                                url=url,
+                                                headers=request.headers,
+                                                json=request.data)
+                event.status = response.status_code
+                event.bytes = len(response.content)
+        except httpx.TransportError:
+            # Network, protocol and timeout errors.
             raise ClientConnectionError
         finally:
-            if self._session is None:
-                session.close()
+            if self._client is None:
+                await client.aclose()
         return response
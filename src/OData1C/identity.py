@@ -0,0 +1,60 @@
+import threading
+from typing import Any, Iterable
+
+# Value of an empty reference in 1C.
+empty_guid = '00000000-0000-0000-0000-000000000000'
+
+
+class IdentityMap:
+    """
+    Thread-safe map of loaded entities by (entity set name, GUID).
+    Each referenced entity is loaded once and the same object is
+    shared by all the objects referring to it. Share one map between
+    managers to share the entities between queries.
+    """
+
+    def __init__(self) -> None:
+        self._objects: dict[tuple[str, str], Any] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+    def __contains__(self, key: tuple[str, str]) -> bool:
+        return key in self._objects
+
+    def get(self, entity_name: str, guid: str) -> Any:
+        return self._objects.get((entity_name, guid))
+
+    def load(self,
+             odata_class: Any,
+             guids: Iterable[str],
+             connection: Any,
+             ignore_invalid: bool = False) -> dict[str, Any]:
+        """
+        Returns the entities by GUIDs. Entities missing from the map
+        are loaded by a few requests with ODataManager.get_many().
+        :param odata_class: OData subclass of the entities.
+        :param guids: GUIDs of the entities.
+        :param connection: Connection used to load the entities.
+        :param ignore_invalid: Skip invalid entities.
+        :return: {guid: entity}. Missing entities are absent.
+        """
+        entity_name = odata_class.entity_name
+        guids = set(guids)
+        with self._lock:
+            missing = [g for g in guids
+                       if (entity_name, g) not in self._objects]
+        if missing:
+            loaded = odata_class.manager(connection).get_many(
+                missing, ignor_invalid=ignore_invalid)
+            with self._lock:
+                for guid, obj in loaded.items():
+                    self._objects.setdefault((entity_name, guid), obj)
+        with self._lock:
+            return {g: self._objects[(entity_name, g)] for g in guids
+                    if (entity_name, g) in self._objects}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._objects.clear()
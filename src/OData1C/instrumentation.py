@@ -0,0 +1,209 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator
+
+try:
+    from opentelemetry import metrics as otel_metrics
+except ImportError:
+    otel_metrics = None
+
+
+@dataclass
+class Event:
+    """
+    Timing event of a request processing phase:
+    build - building query parameters by the manager,
+    prepare - building the request URL,
+    send - an attempt to send the request until the response headers
+    are received (time to first byte),
+    download - downloading the response body,
+    cache - response cache lookup (status is set on a hit),
+    coalesce - waiting for an identical request in flight, see
+    Connection.send_request(),
+    mirror - query of the local mirror, see ODataManager.using(),
+    parse - JSON decoding,
+    validate - pydantic validation (includes JSON decoding if the page
+    is validated in bulk from bytes),
+    decode - conversion into records in the trusted mode.
+    duration - wall time, cpu - CPU time of the thread in seconds.
+    """
+    phase: str
+    entity: str | None = None
+    method: str | None = None
+    url: str | None = None
+    duration: float = 0.0
+    cpu: float = 0.0
+    bytes: int | None = None
+    rows: int | None = None
+    status: int | None = None
+    error: BaseException | None = None
+
+
+class Instrument:
+    """Base class of event receivers. Override on_event()."""
+
+    def on_event(self, event: Event) -> None:
+        raise NotImplementedError
+
+
+class Instrumentation:
+    """Dispatches events to the instruments."""
+
+    def __init__(self, instruments: Iterable[Instrument] = ()) -> None:
+        self.instruments = list(instruments)
+
+    def __bool__(self) -> bool:
+        return bool(self.instruments)
+
+    def emit(self, event: Event) -> None:
+        for instrument in self.instruments:
+            instrument.on_event(event)
+
+    @contextmanager
+    def measure(self, phase: str, **attrs: Any) -> Iterator[Event]:
+        """
+        Measures the duration of the block and emits the event. The
+        yielded event can be supplemented in the block (bytes, rows).
+        Does nothing if there are no instruments.
+        """
+        event = Event(phase, **attrs)
+        if not self.instruments:
+            yield event
+            return
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield event
+        except BaseException as e:
+            event.error = e
+            raise
+        finally:
+            event.duration = time.perf_counter() - start
+            event.cpu = time.thread_time() - cpu_start
+            self.emit(event)
+
+
+class Histogram:
+    """Histogram of durations with fixed bucket bounds in seconds."""
+    bounds = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+              1, 2.5, 5, 10, 30, 60, 120)
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.cpu = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.bytes = 0
+        self.rows = 0
+        self.errors = 0
+
+    def add(self, event: Event) -> None:
+        self.buckets[bisect.bisect_left(self.bounds, event.duration)] += 1
+        self.count += 1
+        self.sum += event.duration
+        self.cpu += event.cpu
+        self.min = min(self.min, event.duration)
+        self.max = max(self.max, event.duration)
+        self.bytes += event.bytes or 0
+        self.rows += event.rows or 0
+        self.errors += event.error is not None
+
+    def percentile(self, q: float) -> float:
+        """Returns the upper bound of the bucket of the q percentile."""
+        rank = q / 100 * self.count
+        total = 0
+        for i, count in enumerate(self.buckets):
+            total += count
+            if count and total >= rank:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return 0.0
+
+    def summary(self) -> dict[str, float]:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'cpu': self.cpu,
+            'bytes': self.bytes,
+            'rows': self.rows,
+            'errors': self.errors,
+        }
+
+
+class MetricsCollector(Instrument):
+    """
+    In-process collector of histograms per (entity, method, phase).
+    Example:
+        metrics = MetricsCollector()
+        conn = Connection(..., instruments=[metrics])
+        ...
+        pprint(metrics.summary())
+    """
+
+    def __init__(self) -> None:
+        self.histograms: dict[tuple[str | None, str | None, str],
+                              Histogram] = {}
+        self._lock = threading.Lock()
+
+    def on_event(self, event: Event) -> None:
+        key = (event.entity, event.method, event.phase)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.add(event)
+
+    def summary(self) -> dict[tuple[str | None, str | None, str],
+                              dict[str, float]]:
+        with self._lock:
+            return {key: histogram.summary()
+                    for key, histogram in self.histograms.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+
+
+class OpenTelemetryInstrument(Instrument):
+    """
+    Records events to OpenTelemetry metrics: the odata1c.duration
+    histogram (seconds), odata1c.bytes and odata1c.rows counters with
+    the entity, method and phase attributes.
+    Requires opentelemetry-api (pip install OData1C[otel]).
+    """
+
+    def __init__(self, meter: Any = None) -> None:
+        if otel_metrics is None:
+            raise ImportError(
+                'OpenTelemetryInstrument requires opentelemetry-api. '
+                'Install it with: pip install OData1C[otel]')
+        meter = meter or otel_metrics.get_meter('OData1C')
+        self.duration = meter.create_histogram(
+            'odata1c.duration', unit='s',
+            description='Duration of request processing phases')
+        self.bytes = meter.create_counter(
+            'odata1c.bytes', unit='By', description='Downloaded bytes')
+        self.rows = meter.create_counter(
+            'odata1c.rows', description='Processed entities')
+
+    def on_event(self, event: Event) -> None:
+        attributes = {'entity': event.entity or '',
+                      'method': event.method or '',
+                      'phase': event.phase}
+        if event.status is not None:
+            attributes['status'] = event.status
+        self.duration.record(event.duration, attributes)
+        if event.bytes:
+            self.bytes.add(event.bytes, attributes)
+        if event.rows:
+            self.rows.add(event.rows, attributes)
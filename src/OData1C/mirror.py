@@ -0,0 +1,302 @@
+import json
+import sqlite3
+import threading
+from copy import copy
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Iterable, get_origin
+from uuid import UUID
+
+from pydantic import ValidationError
+
+from OData1C.exeptions import ODataError
+from OData1C.sync import SyncResult
+
+sql_operators = {'eq': '=', 'ne': '!=', 'gt': '>', 'ge': '>=', 'lt': '<',
+                 'le': '<='}
+
+
+def _column(alias: str) -> str:
+    """Expression of the attribute in the stored entity JSON."""
+    path = '$."{}"'.format(alias.replace('"', '\\"')).replace("'", "''")
+    return f"json_extract(data, '{path}')"
+
+
+def _sql_value(value: Any, annotation: str | None = None) -> Any:
+    """Converts the lookup value as it is stored in the 1C JSON."""
+    if annotation == 'guid' or isinstance(value, UUID):
+        return str(value).lower()
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, datetime):
+        return value.isoformat('T', 'seconds')
+    if isinstance(value, date):
+        return f'{value.isoformat()}T00:00:00'
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Enum):
+        return value.value
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return str(value)
+
+
+def _leaf_predicate(lookup: tuple[str, Any],
+                    field_mapping: dict[str, str]) -> tuple[str, list[Any]]:
+    field, operator, annotation, *_ = (
+        *lookup[0].split('__', maxsplit=3),
+        None,
+        None
+    )
+    if field not in field_mapping:
+        raise KeyError(f"Field '{field}' not found. "
+                       f"Use one of {list(field_mapping.keys())}")
+    column = _column(field_mapping[field])
+    operator = operator or 'eq'
+    value = lookup[1]
+    if operator == 'in':
+        values = list(dict.fromkeys(_sql_value(v, annotation)
+                                    for v in value))
+        if not values:
+            return '0', []
+        return f'{column} IN ({", ".join("?" * len(values))})', values
+    if operator not in sql_operators:
+        raise KeyError(f'Unsupported operator {operator} ({lookup[0]}). '
+                       f'Use one of {(*sql_operators, "in")}.')
+    if value is None and operator in ('eq', 'ne'):
+        return f'{column} IS {"" if operator == "eq" else "NOT "}NULL', []
+    return (f'{column} {sql_operators[operator]} ?',
+            [_sql_value(value, annotation)])
+
+
+def sql_predicate(q: Any,
+                  field_mapping: dict[str, str]) -> tuple[str, list[Any]]:
+    """
+    Translates the odata.Q tree into an SQL predicate on the stored
+    entity JSON. The tree is traversed iteratively, as in
+    Q.build_expression().
+    :param q: odata.Q object.
+    :param field_mapping: {field_name: alias}
+    :return: The predicate and its parameters.
+    """
+    results: dict[int, tuple[str, list[Any]]] = {}
+    stack: list[tuple[Any, bool]] = [(q, False)]
+    while stack:
+        node, ready = stack.pop()
+        if id(node) in results:
+            continue
+        children = node.flat_children
+        if not ready:
+            stack.append((node, True))
+            stack.extend((child, False) for child in children
+                         if not isinstance(child, tuple))
+            continue
+        terms = []
+        params = []
+        for child in children:
+            if isinstance(child, tuple):
+                term, child_params = _leaf_predicate(child, field_mapping)
+            else:
+                term, child_params = results[id(child)]
+            terms.append(f'({term})')
+            params.extend(child_params)
+        sql = f' {node.connector.upper()} '.join(terms) or '1'
+        if node.negated:
+            sql = f'NOT ({sql})'
+        results[id(node)] = sql, params
+    return results[id(q)]
+
+
+class Mirror:
+    """
+    Local copy of entity sets in a sqlite database. Entities are
+    stored as received from 1C (JSON), lookups of odata.Q filters are
+    translated into predicates on the stored JSON, indexes are built
+    on the chosen model fields. The mirror is refreshed incrementally
+    by DataVersion: only new and changed entities are downloaded.
+    Use ODataManager.using() to query the mirror. Thread-safe.
+    Example:
+        mirror = Mirror('catalogs.db')
+        mirror.register(NomenclatureOdata, indexes=['code'])
+        mirror.refresh(NomenclatureOdata.manager(conn))
+        objs = NomenclatureOdata.manager(conn).using(mirror).filter(
+            code__in=['00-123', '00-456']).all()
+    :param path: Path of the database file, by default in memory.
+    """
+
+    def __init__(self, path: str = ':memory:') -> None:
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._tables: set[str] = set()
+
+    @staticmethod
+    def table_name(odata_class: Any) -> str:
+        return f'{odata_class.database}/{odata_class.entity_name}'
+
+    def _table(self, odata_class: Any) -> str:
+        """Returns the quoted table name, creates the table."""
+        name = self.table_name(odata_class)
+        table = '"{}"'.format(name.replace('"', '""'))
+        if name not in self._tables:
+            with self._db:
+                self._db.execute(
+                    f'CREATE TABLE IF NOT EXISTS {table} ('
+                    'guid TEXT PRIMARY KEY, '
+                    'data_version TEXT, '
+                    'data TEXT)'
+                )
+            self._tables.add(name)
+        return table
+
+    def register(self,
+                 odata_class: Any,
+                 indexes: Iterable[str] = ()) -> None:
+        """
+        Creates the table of the entity set and indexes on the model
+        fields used in filters.
+        :param odata_class: OData subclass.
+        :param indexes: Names of the model fields.
+        """
+        fields = odata_class.entity_model.model_fields
+        with self._lock:
+            table = self._table(odata_class)
+            for name in indexes:
+                if name not in fields:
+                    raise KeyError(f"Field '{name}' not found. "
+                                   f"Use one of {list(fields.keys())}")
+                index = '"{}"'.format(
+                    f'{self.table_name(odata_class)}.{name}'.replace(
+                        '"', '""'))
+                with self._db:
+                    self._db.execute(
+                        f'CREATE INDEX IF NOT EXISTS {index} ON {table} '
+                        f'({_column(fields[name].alias or name)})'
+                    )
+
+    def versions(self, odata_class: Any) -> dict[str, str]:
+        """Returns {guid: DataVersion} of the stored entities."""
+        with self._lock:
+            table = self._table(odata_class)
+            return dict(self._db.execute(
+                f'SELECT guid, data_version FROM {table}'))
+
+    def refresh(self,
+                manager: Any,
+                ignor_invalid: bool = False) -> SyncResult:
+        """
+        Downloads the entities which are new or changed since the last
+        refresh and deletes the entities missing on the server. The
+        filter() of the manager defines the mirrored entities, use the
+        same filter on each refresh. Nested models which are not
+        tabular sections are expanded unless expand() is set, the
+        requests are sent by a copy of the manager. Invalid entities
+        raise pydantic.ValidationError or, if ignor_invalid, are not
+        stored (they are downloaded again next time), their errors are
+        stored in validation_errors of the manager.
+        :param manager: ODataManager of the entity set.
+        :return: SyncResult with the changed entities.
+        """
+        model = manager.odata_class.entity_model
+        nested_models = model.nested_models or {}
+        loader = copy(manager)
+        if loader.qp_expand[1] is None:
+            references = [
+                name for name in nested_models
+                if get_origin(model.model_fields[name].annotation) is not list
+            ]
+            if references:
+                loader.expand(*references)
+        known = self.versions(manager.odata_class)
+        current = loader.versions()
+        changed_guids = [guid for guid, version in current.items()
+                         if known.get(guid) != version]
+        data = loader.get_many_data(changed_guids) if changed_guids else {}
+        manager.validation_errors = []
+        changed = {}
+        rows = []
+        for guid in changed_guids:
+            obj = data.get(guid.lower())
+            validated_obj = None
+            if obj is not None:
+                try:
+                    validated_obj = model.model_validate(obj)
+                except ValidationError as e:
+                    manager.validation_errors.append(e)
+                    if not ignor_invalid:
+                        raise e
+            if validated_obj is None:
+                if guid in known:
+                    current[guid] = known[guid]
+                else:
+                    del current[guid]
+                continue
+            changed[guid] = validated_obj
+            # json_extract() matches the keys as they are written, so
+            # non-ASCII keys must not be escaped.
+            rows.append((guid, current[guid],
+                         json.dumps(obj, ensure_ascii=False)))
+        deleted = [guid for guid in known if guid not in current]
+        with self._lock, self._db:
+            table = self._table(manager.odata_class)
+            self._db.executemany(
+                f'INSERT INTO {table} VALUES (?, ?, ?) '
+                'ON CONFLICT(guid) DO UPDATE SET '
+                'data_version = excluded.data_version, data = excluded.data',
+                rows)
+            self._db.executemany(f'DELETE FROM {table} WHERE guid = ?',
+                                 [(guid,) for guid in deleted])
+        return SyncResult(changed=changed, deleted=deleted, versions=current)
+
+    def _where(self, odata_class: Any, q: Any) -> tuple[str, list[Any]]:
+        if q is None:
+            return '', []
+        mapping = {name: info.alias or name for name, info
+                   in odata_class.entity_model.model_fields.items()}
+        sql, params = sql_predicate(q, mapping)
+        return f' WHERE {sql}', params
+
+    def rows(self,
+             odata_class: Any,
+             q: Any = None,
+             top: int | None = None,
+             skip: int | None = None) -> list[dict[str, Any]]:
+        """
+        Returns the stored entity dicts matching the Q filter in the
+        order they were first stored.
+        """
+        where, params = self._where(odata_class, q)
+        sql = f'SELECT data FROM {{table}}{where} ORDER BY rowid'
+        if top is not None or skip:
+            sql += ' LIMIT ? OFFSET ?'
+            params = [*params, -1 if top is None else top, skip or 0]
+        with self._lock:
+            table = self._table(odata_class)
+            try:
+                cursor = self._db.execute(sql.format(table=table), params)
+            except sqlite3.Error as e:
+                raise ODataError(e)
+            return [json.loads(data) for data, in cursor]
+
+    def count(self, odata_class: Any, q: Any = None) -> int:
+        """Returns the number of stored entities matching the Q filter."""
+        where, params = self._where(odata_class, q)
+        with self._lock:
+            table = self._table(odata_class)
+            try:
+                cursor = self._db.execute(
+                    f'SELECT count(*) FROM {table}{where}', params)
+            except sqlite3.Error as e:
+                raise ODataError(e)
+            return cursor.fetchone()[0]
+
+    def get(self, odata_class: Any, guid: str) -> dict[str, Any] | None:
+        """Returns the stored entity dict by GUID or None."""
+        with self._lock:
+            table = self._table(odata_class)
+            row = self._db.execute(f'SELECT data FROM {table} WHERE guid = ?',
+                                   (str(guid).lower(),)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def close(self) -> None:
+        self._db.close()
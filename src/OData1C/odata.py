@@ -1,14 +1,34 @@
-from datetime import datetime
+import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, make_dataclass
+from datetime import date, datetime
+from functools import cache
 from http import HTTPStatus
-from typing import Any, Callable, Iterable, Type
+from pathlib import Path
+from typing import (Any, AsyncIterator, Callable, ContextManager, Iterable,
+                    Iterator, Self, Type, get_origin)
+from urllib.parse import quote
+from uuid import UUID
 
-import requests.exceptions as r_exceptions
-from pydantic import ValidationError
+from pydantic import TypeAdapter, ValidationError
+from pydantic_core import from_json
 from requests import Response
+# pydantic requires typing_extensions.TypedDict on Python < 3.12.
+from typing_extensions import TypedDict
 
+from OData1C.bulk import BulkReport, Checkpoint, run_bulk
+from OData1C.coalesce import MicroBatcher
 from OData1C.exeptions import ODataError, ResponseError
-from OData1C.http import Connection, Request
+from OData1C.http import AsyncConnection, Connection, Request
+from OData1C.identity import IdentityMap, empty_guid
+from OData1C.instrumentation import Event
+from OData1C.mirror import Mirror
 from OData1C.models import OdataModel
+from OData1C.pool import DecodePool, PageResult
+from OData1C.stream import iter_json_list
+from OData1C.sync import SyncResult, SyncStateStore
 
 type_repr = {
     bool: lambda v: str(v).lower(),
@@ -17,10 +37,42 @@ type_repr = {
 }
 
 
+class P:
+    """
+    Placeholder of a value in a prepared query. Can be used as a lookup
+    value (except 'in' lookups) and as the top() and skip() argument.
+    Example: manager.filter(date__gt=P('date')).prepare()
+    """
+    marker_pattern = re.compile(r'~(\w+)~(\w*)~')
+
+    def __init__(self, name: str) -> None:
+        if not name.isidentifier():
+            raise ValueError(f'Invalid placeholder name: {name!r}.')
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f'<{self.__class__.__name__}: {self.name}>'
+
+    def __str__(self) -> str:
+        return self.marker()
+
+    def marker(self, annotation: str | None = None) -> str:
+        """
+        Returns the marker of the placeholder in the expression. The
+        marker consists of characters that are not URL-encoded.
+        """
+        return f'~{self.name}~{annotation or ""}~'
+
+
 class Q:
     """
     Q is a node of a tree graph. A node is a connection whose child
-    nodes are either leaf nodes or other instances of the node.
+    nodes are either leaf nodes (lookups) or other instances of the
+    node. Nodes are immutable: &, | and ~ create a new node referring
+    to the operands, so combining is O(1) and subtrees are shared.
+    The tree is flattened and simplified when the expression is built,
+    without recursion, so trees of any depth and size are built in
+    linear time.
     This code is partially based on Django code.
     """
     AND = 'and'
@@ -34,31 +86,16 @@ class Q:
 
     def __new__(cls, *args: 'Q', **kwargs: Any):
         """
-        Creates a Q object with kwargs leaf. Combines the created
-        Q object with the objects passed via positional arguments
-        using &. Returns the resulting Q object.
+        Creates a Q object with kwargs leaves combined with the objects
+        passed via positional arguments using 'and'.
         :param args: Q objects.
         :param kwargs: Lookups.
         """
-        obj = super().__new__(cls)
-        children = []
-        for key, value in kwargs.items():
-            _, lookup, *_ = *key.split('__'), None
-            if lookup == 'in':
-                children.append(
-                    cls.create(children=[(key, value)], connector=Q.OR))
-            else:
-                children.append((key, value))
-        obj.children = children
-        obj.connector = Q.AND
-        obj.negated = False
-
         for arg in args:
             if not isinstance(arg, Q):
                 raise TypeError(cls._arg_error_msg.format(type(arg)))
-            obj &= arg
-
-        return obj
+        return cls.create(children=[*kwargs.items(), *args],
+                          connector=cls.AND)
 
     def __init__(self, *args: 'Q', **kwargs: Any):
         if not args and not kwargs:
@@ -66,10 +103,11 @@ class Q:
 
     @classmethod
     def create(cls, children=None, connector=None, negated=False):
-        obj = cls.__new__(cls)
-        obj.children = children.copy() if children else []
-        obj.connector = connector if connector is not None else connector
+        obj = super().__new__(cls)
+        obj.children = tuple(children) if children else ()
+        obj.connector = connector or cls.AND
         obj.negated = negated
+        obj._flat_children = None
         return obj
 
     def __str__(self) -> str:
@@ -79,9 +117,7 @@ class Q:
         return f'<{self.__class__.__name__}: {self}>'
 
     def __copy__(self):
-        return self.create(children=self.children,
-                           connector=self.connector,
-                           negated=self.negated)
+        return self
 
     copy = __copy__
 
@@ -92,46 +128,142 @@ class Q:
         return self.combine(other=other, connector=self.AND)
 
     def __invert__(self):
-        obj = self.copy()
-        obj.negated = not self.negated
-        return obj
-
-    def add(self, other) -> None:
-        if self.connector != other.connector or other.negated:
-            self.children.append(other)
-        else:
-            self.children.extend(other.children)
+        return self.create(children=self.children,
+                           connector=self.connector,
+                           negated=not self.negated)
 
     def combine(self, other, connector):
-        obj = self.create(connector=connector)
-        obj.add(self)
-        obj.add(other)
-        return obj
+        if not isinstance(other, Q):
+            raise TypeError(self._arg_error_msg.format(type(other)))
+        return self.create(children=(self, other), connector=connector)
+
+    def _is_mergeable(self, connector: str) -> bool:
+        """
+        Checks whether the node children can be lifted into a parent
+        node with the connector.
+        """
+        return not self.negated and (self.connector == connector
+                                     or len(self.children) == 1)
+
+    @property
+    def flat_children(self) -> tuple[Any, ...]:
+        """
+        Children with nested groups of the same connector (and groups
+        of one child) lifted into this node, in the original order.
+        """
+        if self._flat_children is None:
+            flat = []
+            stack = list(reversed(self.children))
+            while stack:
+                child = stack.pop()
+                if isinstance(child, Q) and child._is_mergeable(
+                        self.connector):
+                    stack.extend(reversed(child.children))
+                else:
+                    flat.append(child)
+            self._flat_children = tuple(flat)
+        return self._flat_children
+
+    def leaves(self) -> Iterator[tuple[str, Any]]:
+        """Yields the lookups of the tree without recursion."""
+        stack: list[Q] = [self]
+        while stack:
+            for child in stack.pop().children:
+                if isinstance(child, Q):
+                    stack.append(child)
+                else:
+                    yield child
 
     def build_expression(self,
                          field_mapping: dict[str, str] | None = None) -> str:
         """
-        Recursively iterates over child elements. Builds an expression
-        taking into account the priorities of the operations.
+        Builds an expression taking into account the priorities of the
+        operations. Nested groups of the same connector are merged,
+        identical terms of a group are deduplicated, brackets are added
+        only where required. The tree is traversed iteratively, so the
+        time is linear in the size of the tree and the expression.
         The field_mapping argument is used to map the field name
         to the OData field name.
         :param field_mapping: {field_name: alias}
         :return: Full filter expression.
         """
-        child_expressions: list[str] = []
-        for child in self.children:
-            if isinstance(child, Q):
-                child_expression: str = child.build_expression(field_mapping)
-                if self.connector == Q.AND and child.connector == Q.OR:
-                    child_expression: str = f'({child_expression})'
+        terms = self._simplify(field_mapping)
+        parts: list[str] = []
+        stack: list[Q | str] = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+                continue
+            node_terms, _, _ = terms[id(item)]
+            tokens: list[Q | str] = []
+            for term, connector in node_terms:
+                if tokens:
+                    tokens.append(f' {item.connector} ')
+                if (len(node_terms) > 1 and item.connector == Q.AND
+                        and connector == Q.OR):
+                    tokens.extend(('(', term, ')'))
+                else:
+                    tokens.append(term)
+            if item.negated:
+                tokens = [f'{self.NOT} (', *tokens, ')']
+            stack.extend(reversed(tokens))
+        return ''.join(parts)
+
+    def _simplify(self,
+                  field_mapping: dict[str, str] | None = None
+                  ) -> dict[int, tuple[list, str | None, Any]]:
+        """
+        Computes the deduplicated terms of each node of the tree
+        bottom-up without recursion. A term is a lookup expression or
+        a child node. Identical subtrees get the same key.
+        :return: {id(node): (terms, connector, key)}, where terms is a
+        list of (term, connector) and connector is the top-level
+        connector of the node expression or None if it is atomic.
+        """
+        result: dict[int, tuple[list, str | None, Any]] = {}
+        keys: dict[tuple, int] = {}
+        stack: list[Q] = [self]
+        while stack:
+            node = stack[-1]
+            if id(node) in result:
+                stack.pop()
+                continue
+            pending = [c for c in node.flat_children
+                       if isinstance(c, Q) and id(c) not in result]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            unique: dict[Any, tuple[Q | str, str | None]] = {}
+            for child in node.flat_children:
+                if isinstance(child, Q):
+                    _, connector, key = result[id(child)]
+                    term = child
+                else:
+                    term, connector = self._build_leaf(child, field_mapping)
+                    key = term
+                unique.setdefault(key, (term, connector))
+            node_terms = list(unique.values())
+            if len(node_terms) == 1 and not node.negated:
+                connector, key = node_terms[0][1], next(iter(unique))
             else:
-                child_expression: str = self._build_lookup(child,
-                                                           field_mapping)
-            child_expressions.append(child_expression)
-        expression = f' {self.connector} '.join(child_expressions)
-        if self.negated:
-            expression = f'{self.NOT} ({expression})'
-        return expression
+                connector = None if node.negated or not node_terms else (
+                    node.connector)
+                key = keys.setdefault(
+                    (node.negated, node.connector, *unique), len(keys))
+            result[id(node)] = node_terms, connector, key
+        return result
+
+    def _build_leaf(self,
+                    lookup: tuple[str, Any],
+                    field_mapping: dict[str, str] | None = None
+                    ) -> tuple[str, str | None]:
+        _, operator, *_ = *lookup[0].split('__'), None
+        expression = self._build_lookup(lookup, field_mapping)
+        if operator == 'in' and len(lookup[1]) > 1:
+            return expression, Q.OR
+        return expression, None
 
     def _build_lookup(self,
                       lookup: tuple[str, Any],
@@ -179,11 +311,24 @@ class Q:
         Converts lookup 'in' to an Odata filter parameter.
         For example: 'foo eq value or foo eq value2 ...'
         """
-        items = [f'{field} eq {self._annotate_value(v, annotation)}'
-                 for v in value]
-        return ' or '.join(items)
+        if isinstance(value, P):
+            raise TypeError("Placeholders are not supported by 'in' lookups.")
+        # Inlined _annotate_value(), 'in' lookups may have thousands
+        # of values.
+        if annotation is None:
+            values = [type_repr[type(v)](v) if type(v) in type_repr
+                      else str(v) for v in value]
+        elif annotation in self._annotations:
+            values = [f"{annotation}'{v}'" for v in value]
+        else:
+            values = [self._annotate_value(v, annotation) for v in value]
+        if not values:
+            return ''
+        term = f'{field} eq '
+        return term + f' or {term}'.join(dict.fromkeys(values))
 
-    def _annotate_value(self,
+    @classmethod
+    def _annotate_value(cls,
                         value: Any,
                         annotation: str | None) -> str:
         """
@@ -192,22 +337,205 @@ class Q:
         :return: Annotated value. For example: guid'123'.
         """
         if annotation is not None:
-            if annotation not in self._annotations:
+            if annotation not in cls._annotations:
                 raise KeyError(
                     f"Unknown annotation {annotation}. "
-                    f"Use one of {self._annotations}"
+                    f"Use one of {cls._annotations}"
                 )
+            if isinstance(value, P):
+                return value.marker(annotation)
             return f"{annotation}'{value}'"
+        if isinstance(value, P):
+            return value.marker()
 
         if type(value) in type_repr:
             return type_repr[type(value)](value)
         return str(value)
 
 
+@cache
+def select_expression(model: Type[OdataModel],
+                      prefix: str = '',
+                      resolved: tuple[str, ...] = ()) -> str:
+    """
+    Builds the $select expression from the model fields. Fields listed
+    in nested_models are replaced with the fields of the nested model
+    (recursively). The result is cached per model class.
+    :param model: Data model class.
+    :param prefix: Path of the nested model, e.g. 'ЕдиницаИзмерения/'.
+    :param resolved: Nested model fields replaced with the reference
+    key attribute <alias>_Key, see ODataManager.resolve().
+    """
+    nested_models = model.nested_models
+    aliases = []
+    for field, info in model.model_fields.items():
+        alias = f'{prefix}{info.alias or field}'
+        if field in resolved:
+            aliases.append(f'{alias}_Key')
+        elif nested_models is not None and field in nested_models:
+            aliases.append(select_expression(nested_models[field],
+                                             f'{alias}/'))
+        else:
+            aliases.append(alias)
+    return ','.join(aliases)
+
+
+@cache
+def field_mapping(model: Type[OdataModel]) -> dict[str, str]:
+    """Returns {field_name: alias}. Cached per model class."""
+    return {f: i.alias or f for f, i in model.model_fields.items()}
+
+
+@cache
+def list_adapter(model: Type[OdataModel], key: str) -> TypeAdapter:
+    """
+    Returns a TypeAdapter validating the {key: [model, ...]} response
+    body in one pass. Other keys of the body are ignored. Cached per
+    model class.
+    """
+    return TypeAdapter(TypedDict(f'{model.__name__}List',
+                                 {key: list[model]}))
+
+
+def validate_page(model: Type[OdataModel],
+                  key: str,
+                  content: bytes,
+                  ignore_invalid: bool = False) -> PageResult:
+    """
+    Validates the list response body. Runs in a DecodePool worker
+    process. Same as BaseODataManager._validate_page(), but validation
+    errors are returned instead of being raised: processing stops at
+    the first invalid object unless ignore_invalid.
+    """
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        objs = list_adapter(model, key).validate_json(content)[key]
+        received = len(objs)
+        errors = []
+    except ValidationError:
+        try:
+            data = from_json(content)[key]
+        except ValueError as e:
+            raise ODataError(e)
+        except (KeyError, TypeError):
+            raise ODataError(f'Response json has no key {key}')
+        received = len(data)
+        objs = []
+        errors = []
+        for obj in data:
+            try:
+                objs.append(model.model_validate(obj))
+            except ValidationError as e:
+                errors.append(e)
+                if not ignore_invalid:
+                    break
+    return PageResult(objs=objs,
+                      received=received,
+                      errors=errors,
+                      duration=time.perf_counter() - start,
+                      cpu=time.process_time() - cpu_start)
+
+
+@cache
+def record_decoder(model: Type[OdataModel]) -> Callable[[dict], Any]:
+    """
+    Returns a function converting an entity dict into a record without
+    validation. A record is an instance of a dataclass with __slots__
+    named <Model>Record whose attributes are the model fields. Values
+    are taken by aliases as is, nested_models are converted into
+    nested records, other values of nested fields (e.g. resolved
+    entities) are kept. The record class is available as the
+    record_class attribute of the function. Cached per model class.
+    """
+    nested_models = model.nested_models or {}
+    record_class = make_dataclass(f'{model.__name__}Record',
+                                  list(model.model_fields),
+                                  slots=True)
+    getters = []
+    for field, info in model.model_fields.items():
+        nested_decoder = None
+        if field in nested_models:
+            nested_decoder = record_decoder(nested_models[field])
+        getters.append((info.alias or field, nested_decoder))
+
+    def decode(obj: dict[str, Any]) -> Any:
+        values = []
+        for alias, nested_decoder in getters:
+            value = obj.get(alias)
+            if nested_decoder is not None:
+                if isinstance(value, dict):
+                    value = nested_decoder(value)
+                elif isinstance(value, list):
+                    value = [nested_decoder(item) for item in value]
+            values.append(value)
+        return record_class(*values)
+
+    decode.record_class = record_class
+    return decode
+
+
+@cache
+def expand_expression(model: Type[OdataModel],
+                      field_names: tuple[str, ...]) -> str:
+    """Builds the $expand expression. Cached per model class."""
+    fields = model.model_fields
+    return ','.join(fields[name].alias or name for name in field_names)
+
+
+@dataclass
+class QueryPlan:
+    """
+    Requests a query is executed with, see BaseODataManager.explain().
+    filters - filters of the requests, the union of their results is
+    the result of the query,
+    url_lengths - lengths of the request URLs,
+    costs - numbers of comparisons in the request filters,
+    post_filter - predicate the received objects must satisfy or None,
+    dedupe - results of the requests may overlap and are deduplicated
+    by Ref_Key,
+    request - the request of a query that fits one request.
+    """
+    filters: list[Q | None]
+    url_lengths: list[int]
+    costs: list[int]
+    post_filter: Callable[[Any], bool] | None = None
+    dedupe: bool = False
+    request: Request | None = None
+
+    @property
+    def is_single(self) -> bool:
+        """The query is executed with one unmodified request."""
+        return self.request is not None
+
+
+@dataclass(frozen=True)
+class VirtualTable:
+    """
+    Virtual table of a register with its parameters, e.g.
+    Balance(Period=datetime'2024-01-01T00:00:00', Dimensions='Склад').
+    Parameter values are OData literals.
+    """
+    name: str
+    params: tuple[tuple[str, str], ...] = ()
+
+    def __str__(self) -> str:
+        params = ', '.join(f'{name}={value}' for name, value in self.params)
+        return f'{self.name}({params})'
+
+
 class OData:
     database: str
     entity_model: Type[OdataModel]
     entity_name: str
+    # Lifetime of cached GET responses in seconds. The responses are
+    # cached if the connection has a cache.
+    cache_ttl: int | float | None = None
+    # Concurrent get() calls made within get_batch_window seconds are
+    # loaded by one Ref_Key filtered request of at most get_batch_size
+    # entities. None disables batching.
+    get_batch_window: float | None = None
+    get_batch_size: int = 100
 
     _err_msg: str = "Required attribute not defined: {}."
 
@@ -220,30 +548,89 @@ class OData:
             cls._err_msg.format(f'{cls.__name__}.entity_name'))
         return ODataManager(odata_class=cls, connection=connection)
 
+    @classmethod
+    def async_manager(cls,
+                      connection: AsyncConnection) -> 'AsyncODataManager':
+        """Returns an instance of the asynchronous odata manager."""
+        assert hasattr(cls, 'entity_model'), (
+            cls._err_msg.format(f'{cls.__name__}.entity_model'))
+        assert hasattr(cls, 'entity_name'), (
+            cls._err_msg.format(f'{cls.__name__}.entity_name'))
+        return AsyncODataManager(odata_class=cls, connection=connection)
+
 
-class ODataManager:
+class BaseODataManager:
+    """
+    Builds requests and handles responses. Request sending is
+    implemented by ODataManager and AsyncODataManager.
+    """
     odata_path = 'odata/standard.odata'
     odata_list_json_key = 'value'
+    ref_key_alias = 'Ref_Key'
+    data_version_alias = 'DataVersion'
+    # Conservative limit of the request URL length of 1C web servers.
+    max_url_length = 2000
+    # Maximum number of comparisons in a request filter, 1C evaluates
+    # long 'or' chains slowly.
+    max_filter_terms = 200
+    # In filters that don't fit one request, 'in' lookups with at least
+    # range_min_values integer values are requested as ranges where at
+    # least range_density of the range values are in the lookup. None
+    # disables the rewrite.
+    range_min_values: int | None = 16
+    range_density = 0.5
+    # Page size of iterator() and fetch_pages() if the connection has
+    # no AdaptiveController.
+    default_page_size = 1000
 
-    def __init__(self, odata_class: Type[OData], connection: Connection):
+    def __init__(self,
+                 odata_class: Type[OData],
+                 connection: Connection | AsyncConnection):
         self.odata_class = odata_class
         self.connection = connection
         self.request: Request | None = None
         self.response: Response | None = None
         self.validation_errors: list[ValidationError] = []
-        self._expand: Iterable[str] | None = None
+        self._expand: tuple[str, ...] | None = None
+        self._resolve: dict[str, Type[OData]] = {}
+        self.identity_map: IdentityMap | None = None
         self._filter: Q | None = None
+        self._select: bool = True
         self._skip: int | None = None
         self._top: int | None = None
+        self._virtual_table: VirtualTable | None = None
+        self._mirror: Mirror | None = None
 
     def __str__(self):
         return f'{self.odata_class.__name__} manager'
 
-    def _check_response(self, ok_status: int) -> None:
-        if self.response.status_code != ok_status:
-            raise ResponseError(self.response.status_code,
-                                self.response.reason,
-                                self.response.text)
+    def _check_response(self,
+                        ok_status: int,
+                        response: Response | None = None) -> None:
+        response = self.response if response is None else response
+        if response.status_code != ok_status:
+            raise ResponseError(response.status_code,
+                                response.reason,
+                                response.text)
+
+    def _page_size(self, page_size: int | None) -> int:
+        """
+        Returns page_size or, if it is None, the current page size of
+        the connection controller.
+        """
+        if page_size is not None:
+            if page_size < 1:
+                raise ValueError('page_size must be a positive integer.')
+            return page_size
+        if self.connection.controller is None:
+            return self.default_page_size
+        return self.connection.controller.page_size(
+            (self.odata_class.database, self.odata_class.entity_name))
+
+    def _measure(self, phase: str) -> ContextManager[Event]:
+        """Measures a processing phase of the entity set requests."""
+        return self.connection.instrumentation.measure(
+            phase, entity=self.odata_class.entity_name, method='GET')
 
     def _validate(self,
                   data: list[dict[str, Any]] | dict[str, Any],
@@ -267,10 +654,13 @@ class ODataManager:
             if not ignore_invalid:
                 raise e
 
-    def _json(self) -> dict[str, Any]:
+    def _json(self, response: Response | None = None) -> dict[str, Any]:
+        response = self.response if response is None else response
         try:
-            data = self.response.json()
-        except r_exceptions.JSONDecodeError as e:
+            data = response.json()
+        except ValueError as e:
+            # requests (json or simplejson) and httpx decoding errors
+            # are ValueError subclasses.
             raise ODataError(e)
         return data
 
@@ -282,60 +672,527 @@ class ODataManager:
     def get_canonical_url(self, guid: str) -> str:
         return f"{self.get_url()}(guid'{guid}')"
 
-    def all(self, ignor_invalid: bool = False) -> list[OdataModel]:
-        """Returns validated instances of the OdataModel class.
-        If ignor_invalid = True, invalid objects will be skipped,
-        errors will be accumulated in self.validation_errors.
-        Otherwise, a pydantic.ValidationError exception will be raised."""
-        self.request = Request(method='GET',
-                               relative_url=self.get_url(),
-                               query_params=self.prepare_qps(
-                                   self.qp_select,
-                                   self.qp_expand,
-                                   self.qp_top,
-                                   self.qp_skip,
-                                   self.qp_filter))
-        self.response = self.connection.send_request(self.request)
-        self._check_response(HTTPStatus.OK)
+    def get_list_url(self) -> str:
+        """URL of the entity set or of its virtual table."""
+        if self._virtual_table is None:
+            return self.get_url()
+        return f'{self.get_url()}/{self._virtual_table}'
+
+    def _list_request(self,
+                      top: int | None = None,
+                      skip: int | None = None,
+                      q: Q | None = None) -> Request:
+        """
+        Builds the entity set request. The q argument replaces the
+        manager filter.
+        """
+        with self._measure('build'):
+            qp_filter = self.qp_filter if q is None else (
+                '$filter', self._filter_expression(q))
+            return Request(method='GET',
+                           relative_url=self.get_list_url(),
+                           query_params=self.prepare_qps(
+                               self.qp_select,
+                               self.qp_expand,
+                               ('$top', top),
+                               ('$skip', skip),
+                               qp_filter))
+
+    def _url_length(self, request: Request) -> int:
+        return len(self.connection.get_url(request.relative_url,
+                                           request.query_params))
+
+    @staticmethod
+    def _is_in_lookup(child: Any) -> bool:
+        """Checks whether the Q child is an 'in' lookup."""
+        if not isinstance(child, tuple):
+            return False
+        _, lookup, *_ = *child[0].split('__'), None
+        return lookup == 'in'
+
+    def _split_filter(self, q: Q | None) -> list[Q | None]:
+        """
+        Splits the filter into several filters so that the URL of each
+        request doesn't exceed max_url_length and the number of
+        comparisons doesn't exceed max_filter_terms. The largest 'in' lookup
+        combined with the rest of the filter by 'and' is split into
+        chunks of values. The union of the results of the returned
+        filters equals the result of the original filter. If the
+        filter cannot be split it is returned as is.
+        """
+        if q is None or self._fits(q, self._top, self._skip):
+            return [q]
+        children = q.flat_children
+        if q.negated or (q.connector != Q.AND and len(children) != 1):
+            return [q]
+        candidates = [c for c in children if self._is_in_lookup(c)]
+        if not candidates:
+            return [q]
+        in_lookup = max(candidates, key=lambda c: len(c[1]))
+        key, values = in_lookup
+        values = list(dict.fromkeys(values))
+
+        def replace(chunk: list[Any]) -> Q:
+            return Q.create(
+                children=[(key, chunk) if c is in_lookup else c
+                          for c in children],
+                connector=Q.AND)
+
+        def fits(chunk: list[Any]) -> bool:
+            return self._fits(replace(chunk))
+
+        def split(chunk: list[Any]) -> list[list[Any]]:
+            if len(chunk) <= 1 or fits(chunk):
+                return [chunk]
+            middle = len(chunk) // 2
+            return split(chunk[:middle]) + split(chunk[middle:])
+
+        # Estimate the chunk size by the URL growth per value, then
+        # halve the chunks that still don't fit.
+        chunk_size = len(values)
+        if len(values) > 1:
+            one = self._url_length(self._list_request(q=replace(values[:1])))
+            full = self._url_length(self._list_request(q=replace(values)))
+            per_value = (full - one) / (len(values) - 1)
+            chunk_size = max(1, 1 + int((self.max_url_length - one)
+                                        // per_value))
+        rest_cost = self._filter_cost(q) - len(in_lookup[1])
+        chunk_size = max(1, min(chunk_size,
+                                self.max_filter_terms - rest_cost))
+        chunks = []
+        for i in range(0, len(values), chunk_size):
+            chunks.extend(split(values[i:i + chunk_size]))
+        return [replace(chunk) for chunk in chunks]
+
+    @staticmethod
+    def _filter_cost(q: Q | None) -> int:
+        """Returns the number of comparisons in the filter."""
+        if q is None:
+            return 0
+        return sum(len(lookup[1]) if BaseODataManager._is_in_lookup(lookup)
+                   else 1 for lookup in q.leaves())
+
+    def _fits(self,
+              q: Q | None,
+              top: int | None = None,
+              skip: int | None = None) -> bool:
+        """
+        Checks whether the filter can be sent in one request: the URL
+        length and the number of comparisons are within the limits.
+        """
+        return (self._filter_cost(q) <= self.max_filter_terms
+                and self._url_length(self._list_request(top, skip, q))
+                <= self.max_url_length)
+
+    def _plan(self, q: Q | None) -> QueryPlan:
+        """
+        Rewrites the filter into requests that fit the URL length and
+        the filter cost limits: dense integer 'in' lookups become
+        ranges with the post filter, disjunctions are split into groups
+        of terms, large 'in' lookups are split into chunks. A filter
+        that fits one request is planned as that request. Raises
+        ODataError if the filter cannot be split within the limits.
+        """
+        cost = self._filter_cost(q)
+        if cost <= self.max_filter_terms:
+            request = self._list_request(self._top, self._skip, q)
+            url_length = self._url_length(request)
+            if url_length <= self.max_url_length:
+                return QueryPlan(filters=[q],
+                                 url_lengths=[url_length],
+                                 costs=[cost],
+                                 request=request)
+        filters, post_filter = self._range_filters(q)
+        planned = []
+        dedupe = False
+        for f in filters:
+            split, overlap = self._split_disjunction(f)
+            planned.extend(split)
+            dedupe = dedupe or overlap
+        single = len(planned) == 1 and post_filter is None
+        top, skip = (self._top, self._skip) if single else (None, None)
+        requests = [self._list_request(top, skip, f) for f in planned]
+        plan = QueryPlan(
+            filters=planned,
+            url_lengths=[self._url_length(r) for r in requests],
+            costs=[self._filter_cost(f) for f in planned],
+            post_filter=post_filter,
+            dedupe=dedupe,
+            request=requests[0] if single else None)
+        if (max(plan.url_lengths) > self.max_url_length
+                or max(plan.costs) > self.max_filter_terms):
+            raise ODataError(
+                f'The filter cannot be split into requests within '
+                f'max_url_length ({self.max_url_length}) and '
+                f'max_filter_terms ({self.max_filter_terms}): '
+                f'{plan.url_lengths}, {plan.costs}.')
+        return plan
+
+    def _range_filters(self, q: Q | None
+                       ) -> tuple[list[Q | None], Callable | None]:
+        """
+        Replaces the largest 'in' lookup of integers combined with the
+        rest of the filter by 'and' with 'ge'/'le' ranges covering its
+        dense runs of values, one request per range, and an 'in' lookup
+        with the remaining values. The post filter drops the objects
+        whose value is not in the lookup.
+        """
+        if q is None or self.range_min_values is None:
+            return [q], None
+        q = self._unwrap(q)
+        if q.negated:
+            return [q], None
+        children = q.flat_children
+        if q.connector != Q.AND and len(children) != 1:
+            return [q], None
+        candidates = [
+            c for c in children
+            if self._is_in_lookup(c) and len(c[0].split('__')) == 2
+            and len(c[1]) >= self.range_min_values
+            and all(type(v) is int for v in c[1])
+        ]
+        if not candidates:
+            return [q], None
+        in_lookup = max(candidates, key=lambda c: len(c[1]))
+        key, values = in_lookup
+        runs, rest = self._dense_runs(values)
+        if not runs:
+            return [q], None
+        name = key.split('__')[0]
+
+        def replace(lookups: list[tuple[str, Any]]) -> Q:
+            others = [c for c in children if c is not in_lookup]
+            return Q.create(children=[*others, *lookups], connector=Q.AND)
+
+        filters = [replace([(f'{name}__ge', low), (f'{name}__le', high)])
+                   for low, high in runs]
+        if rest:
+            filters.append(replace([(key, rest)]))
+        value_set = set(values)
+        return filters, lambda obj: getattr(obj, name) in value_set
+
+    @staticmethod
+    def _unwrap(q: Q) -> Q:
+        """Returns the only child node of groups of one node."""
+        while (not q.negated and len(q.flat_children) == 1
+               and isinstance(q.flat_children[0], Q)):
+            q = q.flat_children[0]
+        return q
+
+    def _dense_runs(self, values: Iterable[int]
+                    ) -> tuple[list[tuple[int, int]], list[int]]:
+        """
+        Splits the sorted distinct values into runs of at least
+        range_min_values values with the range_density share of
+        the range covered.
+        :return: [(low, high), ...] of the runs, values outside runs.
+        """
+        values = sorted(set(values))
+        runs, rest = [], []
+        start = 0
+        for i in range(1, len(values) + 1):
+            if i < len(values) and (i - start + 1) / (
+                    values[i] - values[start] + 1) >= self.range_density:
+                continue
+            if i - start >= self.range_min_values:
+                runs.append((values[start], values[i - 1]))
+            else:
+                rest.extend(values[start:i])
+            start = i
+        return runs, rest
+
+    def _split_disjunction(self, q: Q | None) -> tuple[list[Q | None], bool]:
+        """
+        Splits a filter that doesn't fit one request. A disjunction is
+        split into groups of its terms packed up to the limits, the
+        results of the groups may overlap. Other filters are split by
+        _split_filter() or, if that doesn't fit, distributed over their
+        largest disjunction, see _distribute().
+        :return: Filters and whether their results may overlap.
+        """
+        if q is None or self._fits(q, self._top, self._skip):
+            return [q], False
+        q = self._unwrap(q)
+        children = q.flat_children
+        if (q.negated or q.connector != Q.OR or len(children) < 2
+                or not self._has_ref_key()):
+            filters = self._split_filter(q)
+            distributed = None
+            if not all(self._fits(f) for f in filters):
+                distributed = self._distribute(q)
+            if distributed is None:
+                return filters, False
+            return self._split_disjunction(distributed)[0], True
+        mapping = field_mapping(self.odata_class.entity_model)
+        # URL length with an empty filter.
+        base = self._url_length(self._list_request(q=Q.create()))
+        separator = len(quote(f' {Q.OR} ', safe=''))
+        groups: list[list[Q]] = [[]]
+        length = cost = 0
+        for child in children:
+            if not isinstance(child, Q):
+                child = Q.create([child])
+            child_length = len(quote(child.build_expression(mapping),
+                                     safe=''))
+            child_cost = self._filter_cost(child)
+            if groups[-1] and (
+                    base + length + separator + child_length
+                    > self.max_url_length
+                    or cost + child_cost > self.max_filter_terms):
+                groups.append([])
+                length = cost = 0
+            length += child_length + (separator if groups[-1] else 0)
+            cost += child_cost
+            groups[-1].append(child)
+
+        def split(group: list[Q]) -> list[Q]:
+            if len(group) == 1:
+                return self._split_disjunction(group[0])[0]
+            group_q = Q.create(children=group, connector=Q.OR)
+            if self._fits(group_q):
+                return [group_q]
+            middle = len(group) // 2
+            return split(group[:middle]) + split(group[middle:])
+
+        filters = []
+        for group in groups:
+            filters.extend(split(group))
+        return filters, True
+
+    def _distribute(self, q: Q) -> Q | None:
+        """
+        Distributes the conjunction over its largest disjunction:
+        a & (b | c) becomes (a & b) | (a & c), so that the terms of the
+        disjunction are requested separately. Returns None if q isn't a
+        conjunction with a disjunction or the model has no Ref_Key to
+        deduplicate the results by.
+        """
+        if q.negated or q.connector != Q.AND or not self._has_ref_key():
+            return None
+        children = q.flat_children
+        groups = [c for c in children
+                  if isinstance(c, Q) and not c.negated
+                  and c.connector == Q.OR and len(c.flat_children) > 1]
+        if not groups:
+            return None
+        group = max(groups, key=self._filter_cost)
+        others = [c for c in children if c is not group]
+        return Q.create(
+            children=[Q.create(children=[*others, branch], connector=Q.AND)
+                      for branch in group.flat_children],
+            connector=Q.OR)
+
+    def _has_ref_key(self) -> bool:
+        return any((info.alias or name) == self.ref_key_alias
+                   for name, info
+                   in self.odata_class.entity_model.model_fields.items())
+
+    def _ref_key_field(self) -> str:
+        """Returns the name of the model field mapped to Ref_Key."""
+        for field, info in self.odata_class.entity_model.model_fields.items():
+            if (info.alias or field) == self.ref_key_alias:
+                return field
+        raise ValueError(
+            f"{self.odata_class.entity_model.__name__} has no field "
+            f"with alias '{self.ref_key_alias}'."
+        )
+
+    def _merge_plan(self,
+                    plan: QueryPlan,
+                    pages: Iterable[list[Any]]) -> list[Any]:
+        """
+        Merges the objects of the requests of the plan: applies the
+        post filter, deduplicates the objects by Ref_Key and applies
+        top() and skip() to the merged result.
+        """
+        ref_key = self._ref_key_field() if plan.dedupe else None
+        seen = set()
+        objs = []
+        for page in pages:
+            for obj in page:
+                if plan.post_filter is not None and not plan.post_filter(obj):
+                    continue
+                if ref_key is not None:
+                    key = str(getattr(obj, ref_key))
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                objs.append(obj)
+        skip = self._skip or 0
+        stop = None if self._top is None else skip + self._top
+        return objs[skip:stop]
+
+    def _list_data(self, response: Response) -> list[dict[str, Any]]:
+        self._check_response(HTTPStatus.OK, response)
         try:
-            data: list[dict[str, Any]] = self._json()[self.odata_list_json_key]
+            return self._json(response)[self.odata_list_json_key]
         except KeyError:
             raise ODataError(
                 f'Response json has no key {self.odata_list_json_key}'
             )
-        return self._validate(data, ignor_invalid)
 
-    def get(self, guid: str) -> OdataModel:
-        """Get an entity by guid."""
-        self.request = Request(method='GET',
-                               relative_url=self.get_canonical_url(guid),
-                               query_params=self.prepare_qps(
-                                   self.qp_select,
-                                   self.qp_expand)
-                               )
-        self.response = self.connection.send_request(self.request)
-        self._check_response(HTTPStatus.OK)
-        return self._validate(self._json())
+    def _validate_page(self,
+                       response: Response,
+                       ignore_invalid: bool = False
+                       ) -> tuple[list[OdataModel], int]:
+        """
+        Validates the list response. The whole list is validated in one
+        pass straight from the response bytes. If that fails, objects
+        are validated one by one, so that the error of the invalid
+        object is raised or, if ignore_invalid, invalid objects are
+        skipped. Validation errors are appended to validation_errors.
+        :return: Validated objects and the number of received objects.
+        """
+        self._check_response(HTTPStatus.OK, response)
+        key = self.odata_list_json_key
+        adapter = list_adapter(self.odata_class.entity_model, key)
+        try:
+            with self._measure('validate') as event:
+                event.bytes = len(response.content)
+                validated_objs = adapter.validate_json(response.content)[key]
+                event.rows = len(validated_objs)
+        except ValidationError:
+            with self._measure('parse') as event:
+                event.bytes = len(response.content)
+                data = self._list_data(response)
+                event.rows = len(data)
+        else:
+            return validated_objs, len(validated_objs)
+        with self._measure('validate') as event:
+            validated_objs = []
+            for obj in data:
+                validated_obj = self._validate_obj(obj, ignore_invalid)
+                if validated_obj is not None:
+                    validated_objs.append(validated_obj)
+            event.rows = len(validated_objs)
+        return validated_objs, len(data)
 
-    def update(self,
-               guid: str,
-               data: OdataModel | dict[str, Any]) -> OdataModel:
-        """Updates (patch) an entity by guid."""
+    def _load_page(self,
+                   response: Response,
+                   ignore_invalid: bool = False,
+                   trusted: bool = False) -> tuple[list[Any], int]:
+        """
+        Same as _validate_page(). If trusted, the objects are converted
+        into records by record_decoder() without validation.
+        """
+        if not trusted:
+            return self._validate_page(response, ignore_invalid)
+        self._check_response(HTTPStatus.OK, response)
+        try:
+            with self._measure('parse') as event:
+                event.bytes = len(response.content)
+                data = from_json(response.content)[self.odata_list_json_key]
+                event.rows = len(data)
+        except ValueError as e:
+            raise ODataError(e)
+        except (KeyError, TypeError):
+            raise ODataError(
+                f'Response json has no key {self.odata_list_json_key}'
+            )
+        decode = record_decoder(self.odata_class.entity_model)
+        with self._measure('decode') as event:
+            records = [decode(obj) for obj in data]
+            event.rows = len(records)
+        return records, len(data)
+
+    def _load_obj(self,
+                  obj: dict[str, Any],
+                  ignore_invalid: bool = False,
+                  trusted: bool = False) -> Any:
+        if trusted:
+            return record_decoder(self.odata_class.entity_model)(obj)
+        return self._validate_obj(obj, ignore_invalid)
+
+    def _submit_page(self,
+                     pool: DecodePool,
+                     response: Response,
+                     ignore_invalid: bool = False) -> Future:
+        """
+        Sends the list response body to a worker of the pool for
+        validation. Returns the future of PageResult.
+        """
+        self._check_response(HTTPStatus.OK, response)
+        return pool.submit(validate_page,
+                           self.odata_class.entity_model,
+                           self.odata_list_json_key,
+                           response.content,
+                           ignore_invalid)
+
+    def _page_result(self,
+                     future: Future,
+                     ignore_invalid: bool = False) -> list[OdataModel]:
+        """
+        Waits for the page submitted by _submit_page(). Validation
+        errors are appended to validation_errors, the first of them is
+        raised unless ignore_invalid.
+        """
+        result = future.result()
+        self.connection.instrumentation.emit(Event(
+            'validate',
+            entity=self.odata_class.entity_name,
+            method='GET',
+            duration=result.duration,
+            cpu=result.cpu,
+            rows=len(result.objs)
+        ))
+        self.validation_errors.extend(result.errors)
+        if result.errors and not ignore_invalid:
+            raise result.errors[0]
+        return result.objs
+
+    def _count_request(self) -> Request:
+        return Request(method='GET',
+                       relative_url=f'{self.get_list_url()}/$count',
+                       query_params=self.prepare_qps(self.qp_filter))
+
+    def _count_data(self, response: Response) -> int:
+        self._check_response(HTTPStatus.OK, response)
+        try:
+            return int(response.text)
+        except ValueError:
+            raise ODataError(f'Unexpected $count response: {response.text}')
+
+    def _get_request(self, guid: str) -> Request:
+        return Request(method='GET',
+                       relative_url=self.get_canonical_url(guid),
+                       query_params=self.prepare_qps(
+                           self.qp_select,
+                           self.qp_expand)
+                       )
+
+    @staticmethod
+    def _dump(data: OdataModel | dict[str, Any]) -> dict[str, Any]:
         if isinstance(data, OdataModel):
-            request_data = data.model_dump(by_alias=True)
-        else:
-            request_data = data
-        self.request = Request(method='PATCH',
-                               relative_url=self.get_canonical_url(guid),
-                               data=request_data)
-        self.response = self.connection.send_request(self.request)
-        self._check_response(HTTPStatus.OK)
-        return self._validate(self._json())
+            return data.model_dump(by_alias=True)
+        return data
 
-    def post_document(self,
-                      guid: str,
-                      operational_mode: bool = False) -> None:
-        self.request = Request(
+    def _create_request(self, data: OdataModel | dict[str, Any]) -> Request:
+        return Request(method='POST',
+                       relative_url=self.get_url(),
+                       data=self._dump(data))
+
+    def _update_request(self,
+                        guid: str,
+                        data: OdataModel | dict[str, Any],
+                        data_version: str | None = None) -> Request:
+        headers = None
+        if data_version is not None:
+            headers = {'If-Match': data_version}
+        return Request(method='PATCH',
+                       relative_url=self.get_canonical_url(guid),
+                       data=self._dump(data),
+                       headers=headers)
+
+    def _versions_request(self) -> Request:
+        return Request(method='GET',
+                       relative_url=self.get_url(),
+                       query_params=self.prepare_qps(
+                           ('$select', f'{self.ref_key_alias},'
+                                       f'{self.data_version_alias}'),
+                           self.qp_filter))
+
+    def _post_request(self, guid: str, operational_mode: bool) -> Request:
+        return Request(
             method='POST',
             relative_url=f'{self.get_canonical_url(guid)}/Post',
             query_params={
@@ -344,50 +1201,42 @@ class ODataManager:
                         operational_mode)
             }
         )
-        self.response = self.connection.send_request(self.request)
-        self._check_response(HTTPStatus.OK)
 
-    def unpost_document(self, guid: str) -> None:
-        self.request = Request(
+    def _unpost_request(self, guid: str) -> Request:
+        return Request(
             method='POST',
             relative_url=f'{self.get_canonical_url(guid)}/Unpost'
         )
-        self.response = self.connection.send_request(self.request)
-        self._check_response(HTTPStatus.OK)
 
     """Query parameters."""
 
     @property
     def qp_select(self) -> tuple[str, str | None]:
         qp = '$select'
-        if self._filter is None:
+        if not self._select:
             return qp, None
-        fields = self.odata_class.entity_model.model_fields
-        nested_models = self.odata_class.entity_model.nested_models
-        aliases = []
-        for field, info in fields.items():
-            alias = info.alias or field
-            if nested_models is not None and field in nested_models:
-                for nested_field, nested_info in nested_models[
-                    field].model_fields.items():
-                    nested_alias = nested_info.alias or nested_field
-                    aliases.append(f'{alias}/{nested_alias}')
-            else:
-                aliases.append(alias)
-        return qp, ', '.join(aliases)
+        return qp, select_expression(self.odata_class.entity_model,
+                                     resolved=tuple(self._resolve))
+
+    def all_fields(self) -> Self:
+        """
+        Disables $select, all attributes of the entity are requested.
+        By default, only the attributes of the data model are requested.
+        """
+        self._select = False
+        return self
 
     @property
     def qp_expand(self) -> tuple[str, str | None]:
         qp = '$expand'
         if self._expand is None:
             return qp, None
-        fields = self.odata_class.entity_model.model_fields
-        aliases = []
-        for field_name in self._expand:
-            aliases.append(fields[field_name].alias or field_name)
-        return '$expand', ', '.join(aliases)
+        fields = tuple(f for f in self._expand if f not in self._resolve)
+        if not fields:
+            return qp, None
+        return qp, expand_expression(self.odata_class.entity_model, fields)
 
-    def expand(self, *args: str) -> 'ODataManager':
+    def expand(self, *args: str) -> Self:
         nested_models = self.odata_class.entity_model.nested_models
         fields = []
         for field_name in args:
@@ -397,7 +1246,7 @@ class ODataManager:
                     f"Use one of {list(nested_models.keys())}"
                 )
             fields.append(field_name)
-        self._expand = fields
+        self._expand = tuple(fields)
         return self
 
     @property
@@ -405,11 +1254,13 @@ class ODataManager:
         qp = '$filter'
         if self._filter is None:
             return qp, None
-        fields = self.odata_class.entity_model.model_fields
-        field_mapping = {f: i.alias or f for f, i in fields.items()}
-        return qp, self._filter.build_expression(field_mapping)
+        return qp, self._filter_expression(self._filter)
+
+    def _filter_expression(self, q: Q) -> str:
+        return q.build_expression(
+            field_mapping(self.odata_class.entity_model))
 
-    def filter(self, *args, **kwargs) -> 'ODataManager':
+    def filter(self, *args, **kwargs) -> Self:
         """
         Sets filtering conditions.
         Example: filter(Q(a=1, b__gt), c__in=[1, 2])
@@ -424,11 +1275,150 @@ class ODataManager:
             self._filter = q
         return self
 
+    def virtual_table(self, name: str, **params: Any) -> Self:
+        """
+        Requests the virtual table of the register instead of its
+        records, so that aggregation is done by the 1C server. The
+        entity model describes the rows of the virtual table. Values
+        of the parameters are converted into OData literals: datetime
+        and date - datetime'...', Q - a condition expression with 1C
+        attribute names, a list of strings - a comma-separated list,
+        other values are quoted as strings.
+        Example: virtual_table('Balance', Period=datetime(2024, 1, 1))
+        :param name: Name of the virtual table, e.g. 'Balance'.
+        :param params: Parameters of the virtual table. None values
+        are omitted.
+        :return: self
+        """
+        literals = []
+        for param, value in params.items():
+            if value is not None:
+                literals.append((param, self._virtual_table_literal(value)))
+        self._virtual_table = VirtualTable(name, tuple(literals))
+        return self
+
+    @staticmethod
+    def _virtual_table_literal(value: Any) -> str:
+        if isinstance(value, date):
+            if not isinstance(value, datetime):
+                value = datetime(value.year, value.month, value.day)
+            return type_repr[datetime](value)
+        if isinstance(value, Q):
+            value = value.build_expression()
+        elif isinstance(value, (list, tuple)):
+            value = ','.join(value)
+        value = str(value).replace("'", "''")
+        return f"'{value}'"
+
+    def _check_register(self, *prefixes: str) -> None:
+        if not self.odata_class.entity_name.startswith(prefixes):
+            raise ValueError(
+                f'{self.odata_class.entity_name} is not a register of '
+                f'types {[p.rstrip("_") for p in prefixes]}.'
+            )
+
+    def balance(self,
+                period: date | None = None,
+                condition: Q | str | None = None,
+                dimensions: Iterable[str] | None = None) -> Self:
+        """
+        Requests the Balance virtual table of the accumulation or
+        accounting register.
+        :param period: Balance date, by default the current balance.
+        :param condition: Condition on the register dimensions, e.g.
+        Q(Склад_Key__eq__guid=guid). Names of the 1C attributes are used.
+        :param dimensions: Names of the dimensions of the result, by
+        default all the dimensions.
+        :return: self
+        """
+        self._check_register('AccumulationRegister_', 'AccountingRegister_')
+        return self.virtual_table(
+            'Balance',
+            Period=period,
+            Condition=condition,
+            Dimensions=None if dimensions is None else list(dimensions))
+
+    def turnovers(self,
+                  start_period: date | None = None,
+                  end_period: date | None = None,
+                  condition: Q | str | None = None,
+                  dimensions: Iterable[str] | None = None) -> Self:
+        """
+        Requests the Turnovers virtual table of the accumulation or
+        accounting register.
+        :param start_period: Start of the period, by default unlimited.
+        :param end_period: End of the period, by default unlimited.
+        :param condition: Same as in balance().
+        :param dimensions: Same as in balance().
+        :return: self
+        """
+        self._check_register('AccumulationRegister_', 'AccountingRegister_')
+        return self.virtual_table(
+            'Turnovers',
+            StartPeriod=start_period,
+            EndPeriod=end_period,
+            Condition=condition,
+            Dimensions=None if dimensions is None else list(dimensions))
+
+    def balance_and_turnovers(self,
+                              start_period: date | None = None,
+                              end_period: date | None = None,
+                              condition: Q | str | None = None,
+                              dimensions: Iterable[str] | None = None
+                              ) -> Self:
+        """
+        Requests the BalanceAndTurnovers virtual table of the
+        accumulation or accounting register: opening and closing
+        balances and turnovers of the period.
+        :param start_period: Same as in turnovers().
+        :param end_period: Same as in turnovers().
+        :param condition: Same as in balance().
+        :param dimensions: Same as in balance().
+        :return: self
+        """
+        self._check_register('AccumulationRegister_', 'AccountingRegister_')
+        return self.virtual_table(
+            'BalanceAndTurnovers',
+            StartPeriod=start_period,
+            EndPeriod=end_period,
+            Condition=condition,
+            Dimensions=None if dimensions is None else list(dimensions))
+
+    def slice_last(self,
+                   period: date | None = None,
+                   condition: Q | str | None = None) -> Self:
+        """
+        Requests the SliceLast virtual table of the periodic
+        information register: the latest records on the date.
+        :param period: Date of the slice, by default the current date.
+        :param condition: Same as in balance().
+        :return: self
+        """
+        self._check_register('InformationRegister_')
+        return self.virtual_table('SliceLast',
+                                  Period=period,
+                                  Condition=condition)
+
+    def slice_first(self,
+                    period: date | None = None,
+                    condition: Q | str | None = None) -> Self:
+        """
+        Requests the SliceFirst virtual table of the periodic
+        information register: the earliest records on the date.
+        :param period: Date of the slice, by default unlimited.
+        :param condition: Same as in balance().
+        :return: self
+        """
+        self._check_register('InformationRegister_')
+        return self.virtual_table('SliceFirst',
+                                  Period=period,
+                                  Condition=condition)
+
     @property
     def qp_skip(self) -> tuple[str, str | None]:
         return '$skip', self._skip
 
-    def skip(self, n: int) -> 'ODataManager':
+    def skip(self, n: int) -> Self:
         self._skip = n
         return self
 
@@ -436,7 +1426,7 @@ class ODataManager:
     def qp_top(self) -> tuple[str, str | None]:
         return '$top', self._top
 
-    def top(self, n: int) -> 'ODataManager':
+    def top(self, n: int) -> Self:
         self._top = n
         return self
 
@@ -447,3 +1437,890 @@ class ODataManager:
             if val is not None:
                 qps[qp] = val
         return qps
+
+
+class ODataManager(BaseODataManager):
+    """Sends requests through the blocking http.Connection."""
+    connection: Connection
+    stream_chunk_size = 64 * 1024
+
+    def _send(self, request: Request, stream: bool = False) -> Response:
+        """Sends the request. GET responses are cached, see OData."""
+        request.entity = self.odata_class.entity_name
+        return self.connection.send_request(
+            request,
+            stream=stream,
+            cache_ttl=self.odata_class.cache_ttl)
+
+    def resolve(self,
+                identity_map: IdentityMap | None = None,
+                **fields: Type[OData]) -> Self:
+        """
+        Resolves nested model fields by reference keys instead of
+        $expand: only the <alias>_Key attributes are requested, then
+        the distinct referenced entities are loaded once by a few
+        Ref_Key filtered requests and shared by all the objects
+        through the identity map. The entity model of the OData class
+        must be the nested model of the field. Tabular sections are
+        not supported. Not compatible with stream=True.
+        Example: resolve(measure_unit=MeasureUnitOdata)
+        :param identity_map: Map of the loaded entities. Pass the same
+        map to several managers to share the entities between them.
+        By default, the manager has its own map.
+        :param fields: {nested model field name: OData subclass}.
+        :return: self
+        """
+        nested_models = self.odata_class.entity_model.nested_models or {}
+        model_fields = self.odata_class.entity_model.model_fields
+        for field_name, odata_class in fields.items():
+            if field_name not in nested_models:
+                raise ValueError(
+                    f"Nested model '{field_name}' not found. "
+                    f"Use one of {list(nested_models.keys())}"
+                )
+            if get_origin(model_fields[field_name].annotation) is list:
+                raise ValueError(
+                    f"Tabular section '{field_name}' can't be resolved.")
+            if odata_class.entity_model is not nested_models[field_name]:
+                raise ValueError(
+                    f"Entity model of {odata_class.__name__} is not the "
+                    f"nested model of '{field_name}'."
+                )
+        self._resolve = {**self._resolve, **fields}
+        if identity_map is not None:
+            self.identity_map = identity_map
+        elif self.identity_map is None:
+            self.identity_map = IdentityMap()
+        return self
+
+    def _resolve_data(self,
+                      data: list[dict[str, Any]],
+                      ignore_invalid: bool = False) -> None:
+        """
+        Replaces the reference keys of the resolved fields in the
+        entity dicts with the entities from the identity map. Empty
+        references and missing entities are replaced with None.
+        """
+        model_fields = self.odata_class.entity_model.model_fields
+        for field_name, odata_class in self._resolve.items():
+            alias = model_fields[field_name].alias or field_name
+            key_alias = f'{alias}_Key'
+            guids = {obj.get(key_alias) for obj in data}
+            guids.difference_update((None, empty_guid))
+            objs = self.identity_map.load(odata_class,
+                                          guids,
+                                          self.connection,
+                                          ignore_invalid)
+            for obj in data:
+                obj[alias] = objs.get(obj.pop(key_alias, None))
+
+    def _load_page(self,
+                   response: Response,
+                   ignore_invalid: bool = False,
+                   trusted: bool = False) -> tuple[list[Any], int]:
+        """See BaseODataManager._load_page() and resolve()."""
+        if not self._resolve:
+            return super()._load_page(response, ignore_invalid, trusted)
+        data = self._list_data(response)
+        self._resolve_data(data, ignore_invalid)
+        if trusted:
+            decode = record_decoder(self.odata_class.entity_model)
+            return [decode(obj) for obj in data], len(data)
+        key = self.odata_list_json_key
+        adapter = list_adapter(self.odata_class.entity_model, key)
+        try:
+            return adapter.validate_python({key: data})[key], len(data)
+        except ValidationError:
+            pass
+        validated_objs = []
+        for obj in data:
+            validated_obj = self._validate_obj(obj, ignore_invalid)
+            if validated_obj is not None:
+                validated_objs.append(validated_obj)
+        return validated_objs, len(data)
+
+    def _fetch_page(self, top: int, skip: int) -> Response:
+        """
+        Thread-safe page request. Doesn't change the manager state.
+        """
+        return self._send(self._list_request(top, skip or None))
+
+    def _fetch_filtered(self, q: Q | None) -> Response:
+        """
+        Thread-safe request of the entity set filtered by q without
+        $top/$skip. Doesn't change the manager state.
+        """
+        return self._send(self._list_request(q=q))
+
+    def _iter_list(self, request: Request) -> Iterator[dict[str, Any]]:
+        """
+        Sends the request with a streamed response and yields entity
+        dicts one by one as the response body is received.
+        """
+        if self._resolve:
+            raise ValueError('resolve() is not compatible with stream=True.')
+        self.request = request
+        self.response = self._send(self.request, stream=True)
+        with self.response:
+            self._check_response(HTTPStatus.OK)
+            yield from iter_json_list(
+                self.response.iter_content(self.stream_chunk_size),
+                self.odata_list_json_key
+            )
+
+    def all(self,
+            ignor_invalid: bool = False,
+            stream: bool = False,
+            parallel: int | None = None,
+            trusted: bool = False,
+            processes: int | DecodePool | None = None) -> list[OdataModel]:
+        """Returns validated instances of the OdataModel class.
+        If ignor_invalid = True, invalid objects will be skipped,
+        errors will be accumulated in self.validation_errors.
+        Otherwise, a pydantic.ValidationError exception will be raised.
+        If stream = True, the response body is parsed incrementally and
+        each object is validated as soon as it is received.
+        If parallel is set, pages are requested concurrently by the
+        given number of threads, see fetch_pages().
+        If the request doesn't fit max_url_length or max_filter_terms,
+        it is rewritten into several requests, see explain(). In this
+        case top() and skip() are applied on the client side.
+        If trusted = True, validation is skipped and the objects are
+        returned as lightweight records, see record_decoder(). Use it
+        only for trusted sources, values are not converted.
+        processes is passed to fetch_pages() with parallel."""
+        if self._mirror is not None:
+            self.validation_errors = []
+            return self._mirror_page(self._top,
+                                     self._skip,
+                                     ignor_invalid,
+                                     trusted)[0]
+        if parallel is not None:
+            return self.fetch_pages(workers=parallel,
+                                    ignor_invalid=ignor_invalid,
+                                    trusted=trusted,
+                                    processes=processes)
+        self.validation_errors = []
+        plan = self._plan(self._filter)
+        if not plan.is_single:
+            return self._execute_plan(plan, ignor_invalid, trusted)
+        self.request = plan.request
+        if stream:
+            validated_objs = []
+            for obj in self._iter_list(self.request):
+                validated_obj = self._load_obj(obj, ignor_invalid, trusted)
+                if validated_obj is not None:
+                    validated_objs.append(validated_obj)
+            return validated_objs
+        self.response = self._send(self.request)
+        return self._load_page(self.response, ignor_invalid, trusted)[0]
+
+    def explain(self) -> QueryPlan:
+        """
+        Returns the plan of requests all() executes for the current
+        filter without sending them.
+        """
+        return self._plan(self._filter)
+
+    def _execute_plan(self,
+                      plan: QueryPlan,
+                      ignore_invalid: bool,
+                      trusted: bool) -> list[Any]:
+        """
+        Executes the requests of the plan and merges their results,
+        see _merge_plan().
+        """
+        pages = []
+        for q in plan.filters:
+            self.response = self._fetch_filtered(q)
+            pages.append(self._load_page(self.response,
+                                         ignore_invalid,
+                                         trusted)[0])
+        return self._merge_plan(plan, pages)
+
+    def fetch_pages(self,
+                    workers: int = 4,
+                    page_size: int | None = None,
+                    ignor_invalid: bool = False,
+                    trusted: bool = False,
+                    processes: int | DecodePool | None = None
+                    ) -> list[OdataModel]:
+        """
+        Determines the number of objects with count(), then requests
+        $top/$skip windows of the entity set concurrently using a pool
+        of threads and returns validated objects in the entity set
+        order. The filter(), top() and skip() settings are respected.
+        Use the connection as a context manager, so that all threads
+        share one session and its connection pool.
+        :param workers: Number of threads. The connection controller
+        may allow fewer concurrent requests.
+        :param page_size: Number of objects requested per page, by
+        default the page size of the connection controller or
+        default_page_size.
+        :param ignor_invalid: Same as in all().
+        :param trusted: Same as in all().
+        :param processes: Validate the pages in a DecodePool of the
+        given number of processes, or in the given pool, while the
+        next pages are being received. Ignored if trusted.
+        """
+        if workers < 1:
+            raise ValueError('workers must be a positive integer.')
+        page_size = self._page_size(page_size)
+        if processes is not None and self._resolve:
+            raise ValueError('resolve() is not compatible with processes.')
+        if trusted or isinstance(processes, DecodePool):
+            pool_context = nullcontext(None if trusted else processes)
+        elif processes is not None:
+            pool_context = DecodePool(processes)
+        else:
+            pool_context = nullcontext()
+        start = self._skip or 0
+        end = self.count()
+        if self._top is not None:
+            end = min(end, start + self._top)
+        windows = [(min(page_size, end - skip), skip)
+                   for skip in range(start, end, page_size)]
+        self.validation_errors = []
+        validated_objs = []
+        # The pool is started before the threads, see DecodePool.
+        with (pool_context as pool,
+              ThreadPoolExecutor(max_workers=workers) as executor):
+            responses = executor.map(lambda w: self._fetch_page(*w), windows)
+            if pool is None:
+                for response in responses:
+                    validated_objs.extend(
+                        self._load_page(response, ignor_invalid, trusted)[0])
+                return validated_objs
+            futures = [self._submit_page(pool, response, ignor_invalid)
+                       for response in responses]
+            for future in futures:
+                validated_objs.extend(self._page_result(future,
+                                                        ignor_invalid))
+        return validated_objs
+
+    def iterator(self,
+                 page_size: int | None = None,
+                 ignor_invalid: bool = False,
+                 stream: bool = False,
+                 trusted: bool = False) -> Iterator[OdataModel]:
+        """
+        Lazily walks the entity set page by page using $top/$skip and
+        yields validated instances of the OdataModel class. Only one
+        page is held in memory at a time. The top(), skip() and
+        filter() settings are respected: skip() sets the initial
+        offset, top() limits the total number of requested objects.
+        :param page_size: Number of objects requested per page, by
+        default the page size of the connection controller, updated
+        before each page, or default_page_size.
+        :param ignor_invalid: Same as in all().
+        :param stream: Parse each page incrementally, see all().
+        :param trusted: Skip validation, see all().
+        """
+        self._page_size(page_size)
+        self.validation_errors = []
+        skip = self._skip or 0
+        remaining = self._top
+        while remaining is None or remaining > 0:
+            size = self._page_size(page_size)
+            top = size if remaining is None else min(size, remaining)
+            if self._mirror is not None:
+                validated_objs, received = self._mirror_page(
+                    top, skip, ignor_invalid, trusted)
+                yield from validated_objs
+            elif stream:
+                self.request = self._list_request(top, skip or None)
+                received = 0
+                for obj in self._iter_list(self.request):
+                    received += 1
+                    validated_obj = self._load_obj(obj,
+                                                   ignor_invalid,
+                                                   trusted)
+                    if validated_obj is not None:
+                        yield validated_obj
+            else:
+                self.request = self._list_request(top, skip or None)
+                self.response = self._send(self.request)
+                validated_objs, received = self._load_page(
+                    self.response, ignor_invalid, trusted)
+                yield from validated_objs
+            if received < top:
+                break
+            skip += received
+            if remaining is not None:
+                remaining -= received
+
+    def __iter__(self) -> Iterator[OdataModel]:
+        return self.iterator()
+
+    def prepare(self) -> 'PreparedQuery':
+        """
+        Compiles the query into a reusable PreparedQuery. Values of P
+        placeholders are passed to PreparedQuery.execute().
+        Example:
+            query = manager.filter(date__gt=P('date')).top(10).prepare()
+            objs = query.execute(date=datetime.now())
+        """
+        request = self._list_request(self._top, self._skip)
+        url = self.connection.get_url(request.relative_url,
+                                      request.query_params)
+        return PreparedQuery(self, url[len(self.connection.base_url):])
+
+    def count(self) -> int:
+        """Returns the number of objects matching filter() ($count)."""
+        if self._mirror is not None:
+            return self._mirror.count(self.odata_class, self._filter)
+        self.request = self._count_request()
+        self.response = self._send(self.request)
+        return self._count_data(self.response)
+
+    def get_many(self,
+                 guids: Iterable[str],
+                 chunk_size: int | None = None,
+                 workers: int | None = None,
+                 ignor_invalid: bool = False) -> dict[str, OdataModel]:
+        """
+        Gets entities by a list of GUIDs with a few Ref_Key filtered
+        requests instead of a request per entity. The GUIDs are split
+        into chunks of chunk_size, by default the chunks are as large
+        as max_url_length allows. The filter() setting is respected.
+        :param guids: GUIDs of the entities in any case, with or
+        without braces.
+        :param chunk_size: Number of GUIDs per request.
+        :param workers: Number of threads requesting the chunks
+        concurrently. By default, the chunks are requested serially.
+        :param ignor_invalid: Same as in all().
+        :return: {guid: entity} with the GUIDs as they were passed.
+        Missing entities are absent.
+        """
+        field = self._ref_key_field()
+        # {canonical GUID: [passed GUIDs]}
+        requested: dict[str, list[str]] = {}
+        for guid in guids:
+            requested.setdefault(str(UUID(str(guid))), []).append(str(guid))
+        guids = list(requested)
+        if not guids:
+            return {}
+
+        def chunk_filter(chunk: list[str]) -> Q:
+            q = Q(**{f'{field}__in__guid': chunk})
+            return q if self._filter is None else self._filter & q
+
+        if chunk_size is None:
+            filters = self._split_filter(chunk_filter(guids))
+        else:
+            filters = [chunk_filter(guids[i:i + chunk_size])
+                       for i in range(0, len(guids), chunk_size)]
+        if workers is None:
+            pages = map(self._fetch_filtered, filters)
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+            pages = executor.map(self._fetch_filtered, filters)
+        self.validation_errors = []
+        objs = {}
+        try:
+            for response in pages:
+                for validated_obj in self._load_page(response,
+                                                     ignor_invalid)[0]:
+                    guid = str(getattr(validated_obj, field)).lower()
+                    for passed in requested.get(guid, ()):
+                        objs[passed] = validated_obj
+        finally:
+            if workers is not None:
+                executor.shutdown(cancel_futures=True)
+        return objs
+
+    def get_many_data(self,
+                      guids: list[str]) -> dict[str, dict[str, Any]]:
+        """
+        Same as get_many(), but returns the entity dicts as received
+        without validation. Thread-safe, doesn't change the manager
+        state.
+        :param guids: GUIDs of the entities.
+        :return: {lowercase guid: entity dict}. Missing entities are
+        absent.
+        """
+        field = self._ref_key_field()
+        data = {}
+        for q in self._split_filter(Q(**{f'{field}__in__guid': guids})):
+            for obj in self._list_data(self._fetch_filtered(q)):
+                data[str(obj.get(self.ref_key_alias)).lower()] = obj
+        return data
+
+    def using(self, mirror: Mirror) -> Self:
+        """
+        Answers all(), iterator(), count() and get() from the local
+        mirror instead of the server. The filter(), top() and skip()
+        settings are applied by the mirror, P placeholders, virtual
+        tables and resolve() are not supported, nested models are
+        taken from the mirror. Other methods use the server.
+        :param mirror: Mirror refreshed by Mirror.refresh().
+        :return: self
+        """
+        self._mirror = mirror
+        return self
+
+    def _mirror_page(self,
+                     top: int | None,
+                     skip: int | None,
+                     ignore_invalid: bool = False,
+                     trusted: bool = False) -> tuple[list[Any], int]:
+        """
+        Loads the window of the entities matching filter() from the
+        mirror.
+        :return: Loaded objects and the number of stored objects read.
+        """
+        with self._measure('mirror') as event:
+            data = self._mirror.rows(self.odata_class,
+                                     self._filter,
+                                     top,
+                                     skip)
+            event.rows = len(data)
+        with self._measure('decode' if trusted else 'validate') as event:
+            objs = []
+            for obj in data:
+                loaded_obj = self._load_obj(obj, ignore_invalid, trusted)
+                if loaded_obj is not None:
+                    objs.append(loaded_obj)
+            event.rows = len(objs)
+        return objs, len(data)
+
+    def _get_batcher(self) -> MicroBatcher:
+        """
+        Returns the get() batcher of the connection shared by the
+        managers of the entity set with the same $select and $expand.
+        The batcher loads the entities with its own manager requesting
+        the same $select and $expand, so later changes of this manager
+        don't affect it.
+        """
+        key = ('get', self.odata_class, self.qp_select[1], self.qp_expand[1])
+
+        def create() -> MicroBatcher:
+            loader = self.odata_class.manager(self.connection)
+            loader._select = self._select
+            loader._expand = self._expand
+            loader._resolve = dict(self._resolve)
+            return MicroBatcher(loader.get_many_data,
+                                self.odata_class.get_batch_window,
+                                self.odata_class.get_batch_size)
+
+        return self.connection.get_batcher(key, create)
+
+    def get(self, guid: str) -> OdataModel:
+        """
+        Get an entity by guid. If get_batch_window of the OData class
+        is set, concurrent calls are batched, see MicroBatcher, and a
+        malformed guid raises ValueError in its own call only.
+        """
+        if self._mirror is not None:
+            data = self._mirror.get(self.odata_class, guid)
+            if data is None:
+                raise ResponseError(HTTPStatus.NOT_FOUND,
+                                    HTTPStatus.NOT_FOUND.phrase,
+                                    f"Entity guid'{guid}' not found.")
+        elif self.odata_class.get_batch_window is not None:
+            # A malformed GUID fails here, not in the shared request.
+            data = self._get_batcher().get(str(UUID(str(guid))))
+            if data is None:
+                raise ResponseError(HTTPStatus.NOT_FOUND,
+                                    HTTPStatus.NOT_FOUND.phrase,
+                                    f"Entity guid'{guid}' not found.")
+            # The dict may be shared by the callers of the same GUID.
+            data = dict(data)
+        else:
+            self.request = self._get_request(guid)
+            self.response = self._send(self.request)
+            self._check_response(HTTPStatus.OK)
+            data = self._json()
+        # Mirrored entities are stored with expanded nested models.
+        if self._resolve and self._mirror is None:
+            self._resolve_data([data])
+        return self._validate(data)
+
+    def versions(self) -> dict[str, str]:
+        """
+        Returns {guid: DataVersion} of the entities matching filter().
+        Only Ref_Key and DataVersion attributes are requested.
+        """
+        versions = {}
+        try:
+            for obj in self._iter_list(self._versions_request()):
+                versions[obj[self.ref_key_alias]] = (
+                    obj[self.data_version_alias])
+        except KeyError as e:
+            raise ODataError(f'Response object has no key {e}')
+        return versions
+
+    def changed_since(self,
+                      versions: dict[str, str],
+                      workers: int | None = None,
+                      ignor_invalid: bool = False) -> SyncResult:
+        """
+        Compares the current DataVersion of the entities with versions
+        and downloads only new and changed entities with get_many().
+        The versions of the result contain the current DataVersion of
+        the received entities, so the entities which were not received
+        (e.g. invalid ones) will be requested again next time.
+        :param versions: {guid: DataVersion} known to the caller.
+        :param workers: See get_many().
+        :param ignor_invalid: See get_many().
+        """
+        current = self.versions()
+        changed_guids = [guid for guid, version in current.items()
+                         if versions.get(guid) != version]
+        changed = {}
+        if changed_guids:
+            changed = self.get_many(changed_guids,
+                                    workers=workers,
+                                    ignor_invalid=ignor_invalid)
+        for guid in changed_guids:
+            if guid not in changed:
+                if guid in versions:
+                    current[guid] = versions[guid]
+                else:
+                    del current[guid]
+        deleted = [guid for guid in versions if guid not in current]
+        return SyncResult(changed=changed, deleted=deleted, versions=current)
+
+    def sync_key(self) -> str:
+        return f'{self.odata_class.database}/{self.odata_class.entity_name}'
+
+    def sync(self,
+             store: SyncStateStore,
+             key: str | None = None,
+             workers: int | None = None,
+             ignor_invalid: bool = False) -> SyncResult:
+        """
+        Incremental synchronization. Loads the last known versions from
+        the store, downloads new and changed entities with
+        changed_since() and saves the new state to the store.
+        :param store: Synchronization state store.
+        :param key: State key. Use distinct keys for different filters
+        of the same entity. Default is 'database/entity_name'.
+        """
+        key = key or self.sync_key()
+        result = self.changed_since(store.load(key),
+                                    workers=workers,
+                                    ignor_invalid=ignor_invalid)
+        store.save(key, result.versions)
+        return result
+
+    def update(self,
+               guid: str,
+               data: OdataModel | dict[str, Any],
+               data_version: str | None = None) -> OdataModel:
+        """Updates (patch) an entity by guid.
+        If data_version is given, it is sent in the If-Match header and
+        the server rejects the update if the entity has been changed
+        since that version (lost update protection)."""
+        self.request = self._update_request(guid, data, data_version)
+        self.response = self._send(self.request)
+        self.connection.invalidate(self.get_url())
+        self._check_response(HTTPStatus.OK)
+        return self._validate(self._json())
+
+    def create(self, data: OdataModel | dict[str, Any]) -> OdataModel:
+        """Creates an entity. Returns the created entity."""
+        self.request = self._create_request(data)
+        self.response = self._send(self.request)
+        self.connection.invalidate(self.get_url())
+        self._check_response(HTTPStatus.CREATED)
+        return self._validate(self._json())
+
+    def _write(self,
+               request: Request,
+               ok_status: int,
+               validate: bool) -> OdataModel | None:
+        """
+        Thread-safe write request. Doesn't change the manager state.
+        Returns the validated response entity if validate is True.
+        """
+        response = self._send(request)
+        self._check_response(ok_status, response)
+        if validate:
+            return self.odata_class.entity_model.model_validate(
+                self._json(response))
+        return None
+
+    def bulk_update(self,
+                    items: (dict[str, OdataModel | dict[str, Any]]
+                            | Iterable[tuple[str, OdataModel
+                                             | dict[str, Any]]]),
+                    workers: int = 4,
+                    validate: bool = True) -> BulkReport:
+        """
+        Updates (patch) many entities concurrently using a pool of
+        threads. Errors of individual entities don't abort the run.
+        :param items: {guid: data} or iterable of (guid, data).
+        :param workers: Maximum number of concurrent requests.
+        :param validate: Validate the updated entities returned by the
+        server. Disable to save CPU when the result isn't needed.
+        :return: Report with a result per entity in the input order,
+        the key of a result is the GUID.
+        """
+        if isinstance(items, dict):
+            items = items.items()
+        try:
+            return run_bulk(
+                lambda item: self._write(self._update_request(*item),
+                                         HTTPStatus.OK,
+                                         validate),
+                ((guid, (guid, data)) for guid, data in items),
+                workers)
+        finally:
+            self.connection.invalidate(self.get_url())
+
+    def bulk_create(self,
+                    items: Iterable[OdataModel | dict[str, Any]],
+                    workers: int = 4,
+                    validate: bool = True) -> BulkReport:
+        """
+        Creates many entities concurrently, see bulk_update(). The key
+        of a result is the index of the item.
+        """
+        try:
+            return run_bulk(
+                lambda data: self._write(self._create_request(data),
+                                         HTTPStatus.CREATED,
+                                         validate),
+                enumerate(items),
+                workers)
+        finally:
+            self.connection.invalidate(self.get_url())
+
+    def post_document(self,
+                      guid: str,
+                      operational_mode: bool = False) -> None:
+        self.request = self._post_request(guid, operational_mode)
+        self.response = self._send(self.request)
+        self.connection.invalidate(self.get_url())
+        self._check_response(HTTPStatus.OK)
+
+    def unpost_document(self, guid: str) -> None:
+        self.request = self._unpost_request(guid)
+        self.response = self._send(self.request)
+        self.connection.invalidate(self.get_url())
+        self._check_response(HTTPStatus.OK)
+
+    def post_documents(self,
+                       guids: Iterable[str],
+                       operational_mode: bool = False,
+                       workers: int = 4,
+                       rate_limit: float | None = None,
+                       checkpoint: str | Path | None = None
+                       ) -> BulkReport:
+        """
+        Posts many documents concurrently using a pool of threads.
+        Errors of individual documents don't abort the run.
+        :param guids: GUIDs of the documents.
+        :param operational_mode: See post_document().
+        :param workers: Maximum number of concurrent requests.
+        :param rate_limit: Maximum number of requests per second.
+        :param checkpoint: Path of the checkpoint file. The GUIDs of
+        posted documents are written to it. If the run is interrupted,
+        restart it with the same file to skip the posted documents.
+        :return: Report with a result (GUID, error, elapsed seconds)
+        per document.
+        """
+        return self._run_documents(
+            lambda guid: self._post_request(guid, operational_mode),
+            guids, workers, rate_limit, checkpoint)
+
+    def unpost_documents(self,
+                         guids: Iterable[str],
+                         workers: int = 4,
+                         rate_limit: float | None = None,
+                         checkpoint: str | Path | None = None
+                         ) -> BulkReport:
+        """Unposts many documents, see post_documents()."""
+        return self._run_documents(self._unpost_request,
+                                   guids, workers, rate_limit, checkpoint)
+
+    def _run_documents(self,
+                       build_request: Callable[[str], Request],
+                       guids: Iterable[str],
+                       workers: int,
+                       rate_limit: float | None,
+                       checkpoint: str | Path | None) -> BulkReport:
+        try:
+            return run_bulk(
+                lambda guid: self._write(build_request(guid),
+                                         HTTPStatus.OK,
+                                         validate=False),
+                ((str(guid), str(guid)) for guid in guids),
+                workers,
+                rate_limit,
+                Checkpoint(checkpoint) if checkpoint is not None else None)
+        finally:
+            self.connection.invalidate(self.get_url())
+
+
+class AsyncODataManager(BaseODataManager):
+    """
+    Asynchronous counterpart of ODataManager. Sends requests through
+    http.AsyncConnection, all request methods are coroutines.
+    """
+    connection: AsyncConnection
+
+    def _check_response(self,
+                        ok_status: int,
+                        response: Any = None) -> None:
+        response = self.response if response is None else response
+        if response.status_code != ok_status:
+            raise ResponseError(response.status_code,
+                                response.reason_phrase,
+                                response.text)
+
+    async def _send(self, request: Request) -> Any:
+        request.entity = self.odata_class.entity_name
+        return await self.connection.send_request(request)
+
+    async def _get_page(self,
+                        request: Request,
+                        ignore_invalid: bool,
+                        trusted: bool) -> tuple[list[OdataModel], int]:
+        self.request = request
+        self.response = await self._send(self.request)
+        return self._load_page(self.response, ignore_invalid, trusted)
+
+    async def all(self,
+                  ignor_invalid: bool = False,
+                  trusted: bool = False) -> list[OdataModel]:
+        """See ODataManager.all()."""
+        self.validation_errors = []
+        plan = self._plan(self._filter)
+        if plan.is_single:
+            return (await self._get_page(plan.request,
+                                         ignor_invalid,
+                                         trusted))[0]
+        pages = []
+        for q in plan.filters:
+            pages.append((await self._get_page(self._list_request(q=q),
+                                               ignor_invalid,
+                                               trusted))[0])
+        return self._merge_plan(plan, pages)
+
+    async def iterator(self,
+                       page_size: int | None = None,
+                       ignor_invalid: bool = False,
+                       trusted: bool = False
+                       ) -> AsyncIterator[OdataModel]:
+        """See ODataManager.iterator()."""
+        self._page_size(page_size)
+        self.validation_errors = []
+        skip = self._skip or 0
+        remaining = self._top
+        while remaining is None or remaining > 0:
+            size = self._page_size(page_size)
+            top = size if remaining is None else min(size, remaining)
+            validated_objs, received = await self._get_page(
+                self._list_request(top, skip or None),
+                ignor_invalid,
+                trusted)
+            for validated_obj in validated_objs:
+                yield validated_obj
+            if received < top:
+                break
+            skip += received
+            if remaining is not None:
+                remaining -= received
+
+    def __aiter__(self) -> AsyncIterator[OdataModel]:
+        return self.iterator()
+
+    async def count(self) -> int:
+        """Returns the number of objects matching filter() ($count)."""
+        self.request = self._count_request()
+        self.response = await self._send(self.request)
+        return self._count_data(self.response)
+
+    async def get(self, guid: str) -> OdataModel:
+        """Get an entity by guid."""
+        self.request = self._get_request(guid)
+        self.response = await self._send(self.request)
+        self._check_response(HTTPStatus.OK)
+        return self._validate(self._json())
+
+    async def update(self,
+                     guid: str,
+                     data: OdataModel | dict[str, Any],
+                     data_version: str | None = None) -> OdataModel:
+        """Updates (patch) an entity by guid. See ODataManager.update()."""
+        self.request = self._update_request(guid, data, data_version)
+        self.response = await self._send(self.request)
+        self._check_response(HTTPStatus.OK)
+        return self._validate(self._json())
+
+    async def create(self,
+                     data: OdataModel | dict[str, Any]) -> OdataModel:
+        """Creates an entity. Returns the created entity."""
+        self.request = self._create_request(data)
+        self.response = await self._send(self.request)
+        self._check_response(HTTPStatus.CREATED)
+        return self._validate(self._json())
+
+    async def post_document(self,
+                            guid: str,
+                            operational_mode: bool = False) -> None:
+        self.request = self._post_request(guid, operational_mode)
+        self.response = await self._send(self.request)
+        self._check_response(HTTPStatus.OK)
+
+    async def unpost_document(self, guid: str) -> None:
+        self.request = self._unpost_request(guid)
+        self.response = await self._send(self.request)
+        self._check_response(HTTPStatus.OK)
+
+
+class PreparedQuery:
+    """
+    Query of the entity set compiled by ODataManager.prepare(). The
+    encoded URL is built once, execute() only substitutes the encoded
+    placeholder values.
+    """
+
+    def __init__(self, manager: ODataManager, relative_url: str) -> None:
+        self.manager = manager
+        self.relative_url = relative_url
+        self._parts: list[str | tuple[str, str | None]] = []
+        position = 0
+        for match in P.marker_pattern.finditer(relative_url):
+            self._parts.append(relative_url[position:match.start()])
+            self._parts.append((match[1], match[2] or None))
+            position = match.end()
+        self._parts.append(relative_url[position:])
+        self.params = frozenset(part[0] for part in self._parts
+                                if isinstance(part, tuple))
+
+    def __repr__(self) -> str:
+        return f'<{self.__class__.__name__}: {self.relative_url}>'
+
+    def get_relative_url(self, **values: Any) -> str:
+        if values.keys() != self.params:
+            raise TypeError(
+                f'Expected values of placeholders {sorted(self.params)}, '
+                f'got {sorted(values)}.'
+            )
+        parts = []
+        for part in self._parts:
+            if isinstance(part, tuple):
+                name, annotation = part
+                part = quote(Q._annotate_value(values[name], annotation),
+                             safe='')
+            parts.append(part)
+        return ''.join(parts)
+
+    def execute(self,
+                ignor_invalid: bool = False,
+                **values: Any) -> list[OdataModel]:
+        """
+        Executes the query with the given placeholder values. Returns
+        validated instances of the OdataModel class, see
+        ODataManager.all(). Fields of resolve() are resolved.
+        """
+        manager = self.manager
+        manager.request = Request(
+            method='GET',
+            relative_url=self.get_relative_url(**values))
+        manager.response = manager._send(manager.request)
+        manager.validation_errors = []
+        return manager._load_page(manager.response, ignor_invalid)[0]
@@ -0,0 +1,68 @@
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing.context import BaseContext
+from typing import Any, Callable
+
+from pydantic import ValidationError
+
+
+@dataclass
+class PageResult:
+    """
+    Result of a page processed by a worker process.
+    objs - validated objects in the page order,
+    received - number of objects in the page,
+    errors - validation errors. If the page was processed without
+    ignore_invalid, processing stopped at the first invalid object,
+    duration, cpu - wall and CPU time of the worker in seconds.
+    """
+    objs: list[Any]
+    received: int
+    errors: list[ValidationError] = field(default_factory=list)
+    duration: float = 0.0
+    cpu: float = 0.0
+
+
+class DecodePool:
+    """
+    Pool of processes decoding and validating list responses, so that
+    validation of large pages isn't limited by the GIL and scales with
+    CPU cores. Raw response bytes are sent to the workers, validated
+    objects are sent back. Entity models are pickled by reference: with
+    the spawn and forkserver start methods the models must be
+    importable by the workers.
+    Example:
+        with DecodePool(4) as pool:
+            objs = manager.fetch_pages(workers=8, processes=pool)
+    :param processes: Number of worker processes, by default the number
+    of CPUs.
+    :param mp_context: multiprocessing context, by default the default
+    context of the platform.
+    """
+
+    def __init__(self,
+                 processes: int | None = None,
+                 mp_context: BaseContext | None = None) -> None:
+        self.processes = processes or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(self.processes,
+                                             mp_context=mp_context)
+        # Start all the workers before the request threads are started:
+        # forking a process with running threads is unsafe.
+        for future in [self._executor.submit(os.getpid)
+                       for _ in range(self.processes)]:
+            future.result()
+
+    def submit(self, func: Callable, *args: Any) -> Future:
+        """Schedules func(*args) in a worker process."""
+        return self._executor.submit(func, *args)
+
+    def close(self) -> None:
+        """Cancels pending tasks and stops the workers."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> 'DecodePool':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
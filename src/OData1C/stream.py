@@ -0,0 +1,111 @@
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+from OData1C.exeptions import ODataError
+
+_decoder = json.JSONDecoder()
+_whitespace = ' \t\n\r'
+_delimiters = _whitespace + ',:]}'
+
+
+class _Buffer:
+    """
+    Text buffer over an iterable of byte chunks. Bytes are decoded
+    incrementally, consumed text is dropped from the buffer.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.text = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def read(self) -> bool:
+        """Appends the next chunk. Returns False if there is no data."""
+        if self.exhausted:
+            return False
+        for chunk in self._chunks:
+            if chunk:
+                self.text = self.text[self.pos:] + self._decoder.decode(chunk)
+                self.pos = 0
+                return True
+        self.text = self.text[self.pos:] + self._decoder.decode(b'', True)
+        self.pos = 0
+        self.exhausted = True
+        return True
+
+    def peek(self) -> str:
+        """Skips whitespace, returns the next char ('' at the end)."""
+        while True:
+            while (self.pos < len(self.text)
+                   and self.text[self.pos] in _whitespace):
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.read():
+                return ''
+
+    def expect(self, *chars: str) -> str:
+        char = self.peek()
+        if char not in chars or not char:
+            raise ODataError(
+                f'Invalid JSON: expected one of {chars}, got {char!r}.')
+        self.pos += 1
+        return char
+
+    def decode(self) -> Any:
+        """
+        Decodes the next JSON value. The value is accepted only if it
+        is followed by a delimiter or the stream is exhausted, so a
+        truncated number is never returned. After an unsuccessful
+        attempt the buffer is grown to at least twice its size, which
+        keeps decoding of large values linear.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError as e:
+                if self.exhausted:
+                    raise ODataError(e)
+            else:
+                if (self.exhausted or end < len(self.text)
+                        and self.text[end] in _delimiters):
+                    self.pos = end
+                    return value
+            target = 2 * (len(self.text) - self.pos)
+            while self.read() and len(self.text) - self.pos < target:
+                pass
+
+
+def iter_json_list(chunks: Iterable[bytes], key: str) -> Iterator[Any]:
+    """
+    Incrementally parses a JSON object of the form
+    {..., key: [item, item, ...], ...} and yields the items of the
+    list one by one as soon as they are received.
+    :param chunks: Iterable of the response body chunks.
+    :param key: Key of the list in the top level object.
+    """
+    buffer = _Buffer(chunks)
+    buffer.expect('{')
+    if buffer.peek() == '}':
+        raise ODataError(f'Response json has no key {key}')
+    while True:
+        name = buffer.decode()
+        buffer.expect(':')
+        if name != key:
+            buffer.decode()
+        else:
+            buffer.expect('[')
+            if buffer.peek() == ']':
+                buffer.pos += 1
+            else:
+                while True:
+                    yield buffer.decode()
+                    if buffer.expect(',', ']') == ']':
+                        break
+            return
+        if buffer.expect(',', '}') == '}':
+            raise ODataError(f'Response json has no key {key}')
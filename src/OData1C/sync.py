@@ -0,0 +1,81 @@
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+
+from OData1C.models import OdataModel
+
+
+@dataclass
+class SyncResult:
+    """
+    Result of ODataManager.sync().
+    changed - new and changed entities,
+    deleted - GUIDs of the entities missing on the server,
+    versions - current {guid: DataVersion} of all entities.
+    """
+    changed: dict[str, OdataModel] = field(default_factory=dict)
+    deleted: list[str] = field(default_factory=list)
+    versions: dict[str, str] = field(default_factory=dict)
+
+
+class SyncStateStore:
+    """
+    Base class of storages of the synchronization state: the last
+    known DataVersion of each entity. Subclass it to implement
+    a custom storage.
+    """
+
+    def load(self, key: str) -> dict[str, str]:
+        """Returns {guid: DataVersion} saved by the key."""
+        raise NotImplementedError
+
+    def save(self, key: str, versions: dict[str, str]) -> None:
+        raise NotImplementedError
+
+
+class MemorySyncStateStore(SyncStateStore):
+
+    def __init__(self) -> None:
+        self._data: dict[str, dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, key: str) -> dict[str, str]:
+        with self._lock:
+            return dict(self._data.get(key, {}))
+
+    def save(self, key: str, versions: dict[str, str]) -> None:
+        with self._lock:
+            self._data[key] = dict(versions)
+
+
+class SqliteSyncStateStore(SyncStateStore):
+    """Stores the synchronization state in a sqlite database file."""
+
+    def __init__(self, path: str) -> None:
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS odata_sync_state ('
+                'key TEXT PRIMARY KEY, '
+                'versions TEXT)'
+            )
+
+    def load(self, key: str) -> dict[str, str]:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT versions FROM odata_sync_state WHERE key = ?',
+                (key,)
+            ).fetchone()
+        return {} if row is None else json.loads(row[0])
+
+    def save(self, key: str, versions: dict[str, str]) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO odata_sync_state VALUES (?, ?)',
+                (key, json.dumps(versions))
+            )
+
+    def close(self) -> None:
+        self._db.close()